@@ -1,8 +1,26 @@
+import argparse
+import json
+import os
+import struct
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import numpy as np
-import matplotlib.pyplot as plt
-import simpleaudio as sa
-import tkinter as tk
-from tkinter import ttk
+
+NFFT = 1024  # Samples per FFT
+HOP = 512  # Samples between the starts of consecutive FFTs
+BLOCK_SIZE = 65536  # Samples transformed per block
+MAX_IMAGE_WIDTH = 2048  # Longer audio is max-pooled into this many pixel columns
+DYNAMIC_RANGE = 80  # dB below the loudest bin that maps to the bottom of the colour scale
+AUDIO_EXTENSIONS = ('.wav', '.m4a', '.mp3', '.aac', '.flac', '.ogg')
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+WavInfo = namedtuple('WavInfo', ['format_tag', 'channels', 'sample_rate', 'block_align', 'bits', 'data_offset', 'data_size'])
 
 # Function to generate a random audio tone
 def generate_random_tone(duration_ms=1000, sample_rate=44100):
@@ -28,40 +46,352 @@ def mix_audio_signals(signals):
     mixed_signal = np.int16(mixed_signal * 32767)
     return mixed_signal
 
+def iter_blocks(signal, block_size=BLOCK_SIZE):
+    for start in range(0, len(signal), block_size):
+        yield signal[start:start + block_size]
+
+def to_float(block):
+    # 16-bit PCM to -1..1, float input passes through
+    if block.dtype.kind in 'iu':
+        return block.astype(np.float32) / np.iinfo(block.dtype).max
+    return block.astype(np.float32, copy=False)
+
+class StreamingSTFT:
+    # FFTs a stream of blocks; only the nfft - hop samples a frame still needs are carried between blocks
+    def __init__(self, nfft=NFFT, hop=HOP):
+        if nfft < 1:
+            raise ValueError(f"nfft must be at least 1: {nfft}")
+        if not 0 < hop <= nfft:
+            raise ValueError(f"Hop must be between 1 and nfft ({nfft}): {hop}")
+        self.nfft = nfft
+        self.hop = hop
+        self.bins = nfft // 2 + 1
+        self.window = np.hanning(nfft).astype(np.float32)
+        self.pending = np.zeros(0, dtype=np.float32)
+
+    def frame_count(self, num_samples):
+        return max(0, 1 + (num_samples - self.nfft) // self.hop)
+
+    def process(self, block):
+        # Returns a (frames, bins) array of magnitudes in dB for every frame the block completes
+        samples = np.concatenate([self.pending, to_float(block)])
+        count = self.frame_count(len(samples))
+        if count == 0:
+            self.pending = samples
+            return np.empty((0, self.bins), dtype=np.float32)
+        frames = np.lib.stride_tricks.sliding_window_view(samples, self.nfft)[::self.hop][:count] * self.window
+        magnitudes = np.abs(np.fft.rfft(frames, axis=1)).astype(np.float32)
+        self.pending = samples[count * self.hop:]
+        return 20 * np.log10(magnitudes + 1e-10)
+
+class SpectrogramImage:
+    # Max-pools STFT frames into at most max_width columns, so memory doesn't grow with duration
+    def __init__(self, num_frames, bins, max_width=MAX_IMAGE_WIDTH):
+        if max_width < 1:
+            raise ValueError(f"Image width must be at least 1 pixel: {max_width}")
+        self.frames_per_column = max(1, -(-num_frames // max_width))
+        self.columns = np.full((-(-num_frames // self.frames_per_column), bins), -np.inf, dtype=np.float32)
+        self.position = 0
+
+    def add(self, frames):
+        if not len(frames):
+            return
+        columns = (self.position + np.arange(len(frames))) // self.frames_per_column
+        starts = np.flatnonzero(np.diff(columns, prepend=-1))
+        targets = columns[starts]
+        self.columns[targets] = np.maximum(self.columns[targets], np.maximum.reduceat(frames, starts, axis=0))
+        self.position += len(frames)
+
+    def to_pixels(self, dynamic_range=DYNAMIC_RANGE):
+        # Rows are frequency with the lowest at the bottom, like plt.specgram
+        top = self.columns.max() if self.columns.size else 0.0
+        levels = np.clip((self.columns - (top - dynamic_range)) / dynamic_range, 0, 1)
+        return (levels.T[::-1] * 255).astype(np.uint8)
+
+    def save_png(self, path):
+        import cv2  # Only image export needs OpenCV
+        cv2.imwrite(path, cv2.applyColorMap(self.to_pixels(), cv2.COLORMAP_VIRIDIS))
+
+def write_spectrogram(blocks, num_samples, png_path=None, npy_path=None, nfft=NFFT, hop=HOP, max_width=MAX_IMAGE_WIDTH):
+    # blocks is any iterable of sample arrays adding up to num_samples, which sizes the outputs up front.
+    # The .npy gets every frame in dB as (frames, bins) float32, streamed to disk through a memmap
+    stft = StreamingSTFT(nfft, hop)
+    num_frames = stft.frame_count(num_samples)
+    if num_frames == 0:
+        # An empty image would crash OpenCV's colour map rather than raise
+        raise ValueError(f"Need at least {nfft} samples for one FFT frame, got {num_samples}")
+    image = SpectrogramImage(num_frames, stft.bins, max_width)
+    table = np.lib.format.open_memmap(npy_path, mode='w+', dtype=np.float32, shape=(num_frames, stft.bins)) if npy_path else None
+    position = 0
+    for block in blocks:
+        frames = stft.process(block)[:num_frames - position]
+        image.add(frames)
+        if table is not None:
+            table[position:position + len(frames)] = frames
+        position += len(frames)
+    if table is not None:
+        table.flush()
+        del table
+    if png_path:
+        image.save_png(png_path)
+    return image
+
+def read_wav_header(path):
+    # Walks the RIFF chunks for the format and where the samples start; the samples themselves aren't read
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:] != b'WAVE':
+            raise ValueError(f"Not a WAV file: {path}")
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"No audio data in {path}")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                body = f.read(size + size % 2)
+                if len(body) < 16:
+                    raise ValueError(f"Truncated format chunk in {path}")
+                format_tag, channels, sample_rate, _, block_align, bits = struct.unpack('<HHIIHH', body[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                    format_tag = struct.unpack('<H', body[24:26])[0]  # The sub-format GUID starts with the real tag
+                fmt = (format_tag, channels, sample_rate, block_align, bits)
+            elif chunk_id == b'data' and fmt is not None:
+                offset = f.tell()
+                # Streamed WAVs can carry a placeholder size, so never map past the end of the file
+                return WavInfo(*fmt, offset, min(size, os.fstat(f.fileno()).st_size - offset))
+            else:
+                f.seek(size + size % 2, 1)
+
+def wav_layout(path):
+    # Header, sample dtype, trailing shape and frame count: frames map as (frames, channels), or as
+    # (frames, channels, 3) bytes for 24-bit audio
+    info = read_wav_header(path)
+    width = info.block_align // info.channels
+    if info.format_tag == WAVE_FORMAT_PCM and width in (1, 2, 3, 4):
+        dtype, shape = ('u1', (3,)) if width == 3 else ({1: 'u1', 2: '<i2', 4: '<i4'}[width], ())
+    elif info.format_tag == WAVE_FORMAT_IEEE_FLOAT and width in (4, 8):
+        dtype, shape = {4: '<f4', 8: '<f8'}[width], ()
+    else:
+        raise ValueError(f"Unsupported WAV encoding (format {info.format_tag}, {info.bits} bits): {path}")
+    return info, dtype, shape, info.data_size // info.block_align
+
+def pcm_to_float(block):
+    # A (frames, channels) block of WAV samples as mono float32
+    if block.ndim == 3:
+        # 24-bit: assemble the three little-endian bytes, then shift up and back to sign-extend
+        value = block[..., 0].astype(np.int32) | (block[..., 1].astype(np.int32) << 8) | (block[..., 2].astype(np.int32) << 16)
+        samples = ((value << 8) >> 8).astype(np.float32) / 2 ** 23
+    elif block.dtype == np.uint8:
+        samples = (block.astype(np.float32) - 128) / 128  # 8-bit WAV is unsigned
+    else:
+        samples = to_float(block)
+    return samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+
+def wav_blocks(path, block_size=BLOCK_SIZE):
+    # Every block is its own small memory map, dropped once converted, so however long the
+    # file only one block of it is ever resident
+    info, dtype, shape, frames = wav_layout(path)
+    for start in range(0, frames, block_size):
+        count = min(block_size, frames - start)
+        yield pcm_to_float(np.memmap(path, dtype=dtype, mode='r', offset=info.data_offset + start * info.block_align,
+                                     shape=(count, info.channels) + shape))
+
+def probe_audio(path):
+    # Sample rate and length in samples of the first audio stream
+    try:
+        result = subprocess.run(['ffprobe', '-v', 'error', '-select_streams', 'a:0', '-show_entries', 'stream=sample_rate:format=duration',
+                                 '-of', 'json', path], capture_output=True, text=True, check=True)
+    except FileNotFoundError:
+        raise IOError(f"Decoding {os.path.splitext(path)[1]} files needs ffmpeg and ffprobe on the PATH")
+    except subprocess.CalledProcessError as e:
+        raise IOError(f"Cannot read audio from {path}: {e.stderr.strip()}")
+    info = json.loads(result.stdout)
+    if not info.get('streams'):
+        raise IOError(f"No audio stream in {path}")
+    sample_rate = int(info['streams'][0]['sample_rate'])
+    return sample_rate, int(round(float(info['format']['duration']) * sample_rate))
+
+def ffmpeg_blocks(path, num_samples, sample_rate, block_size=BLOCK_SIZE):
+    # ffmpeg decodes to mono 16-bit PCM on a pipe that is read one block at a time. Exactly num_samples
+    # come out: the container's duration can be a few samples off, so the end is trimmed or padded
+    process = subprocess.Popen(['ffmpeg', '-v', 'error', '-i', path, '-vn', '-f', 's16le', '-ac', '1', '-ar', str(sample_rate), '-'],
+                               stdout=subprocess.PIPE, stdin=subprocess.DEVNULL)
+    remaining = num_samples
+    try:
+        while remaining > 0:
+            data = process.stdout.read(min(block_size, remaining) * 2)
+            if len(data) < 2:
+                break
+            block = np.frombuffer(data, dtype='<i2', count=len(data) // 2)
+            remaining -= len(block)
+            yield block
+        if remaining > 0:
+            yield np.zeros(remaining, dtype=np.int16)
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+def open_audio(path, block_size=BLOCK_SIZE):
+    # Returns (blocks, num_samples, sample_rate) without loading the file: WAVs are memory-mapped,
+    # anything else is decoded by ffmpeg as the blocks are consumed
+    if path.lower().endswith('.wav'):
+        try:
+            info, _, _, frames = wav_layout(path)
+            return wav_blocks(path, block_size), frames, info.sample_rate
+        except ValueError:
+            pass  # Compressed or unusual WAV encodings go through ffmpeg like every other format
+    sample_rate, num_samples = probe_audio(path)
+    return ffmpeg_blocks(path, num_samples, sample_rate, block_size), num_samples, sample_rate
+
+def audio_file_to_image(path, png_path=None, npy_path=None, nfft=NFFT, hop=HOP, max_width=MAX_IMAGE_WIDTH):
+    blocks, num_samples, sample_rate = open_audio(path)
+    image = write_spectrogram(blocks, num_samples, png_path, npy_path, nfft, hop, max_width)
+    return image, num_samples / sample_rate, sample_rate
+
+def find_audio_files(source):
+    if not os.path.isdir(source):
+        return [os.path.abspath(source)]
+    paths = [os.path.join(folder, name) for folder, _, names in os.walk(source) for name in names]
+    return sorted(os.path.abspath(path) for path in paths if path.lower().endswith(AUDIO_EXTENSIONS))
+
+def export_one(path, output_base, nfft, hop, max_width, save_npy):
+    # Bad inputs raise here in the worker, so they come back as one failed job rather than a broken pool
+    start_time = time.perf_counter()
+    blocks, num_samples, sample_rate = open_audio(path)
+    if num_samples < nfft:
+        raise ValueError(f"Only {num_samples} samples, need at least {nfft} for one FFT frame")
+    os.makedirs(os.path.dirname(output_base), exist_ok=True)
+    write_spectrogram(blocks, num_samples, output_base + '.png', output_base + '.npy' if save_npy else None, nfft, hop, max_width)
+    return num_samples / sample_rate, time.perf_counter() - start_time
+
+def export_directory(sources, output_dir, nfft=NFFT, hop=HOP, max_width=MAX_IMAGE_WIDTH, save_npy=False, workers=None):
+    # One PNG (and optionally .npy) per audio file, mirroring each source directory's layout under output_dir
+    jobs = []
+    for source in sources:
+        base_dir = source if os.path.isdir(source) else os.path.dirname(os.path.abspath(source))
+        for path in find_audio_files(source):
+            relative = os.path.splitext(os.path.relpath(path, base_dir))[0]
+            jobs.append((path, os.path.join(output_dir, relative)))
+    if not jobs:
+        print(f"No audio files found in {', '.join(sources)}")
+        return 0
+
+    start_time = time.perf_counter()
+    total_audio = 0.0
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(export_one, path, output_base, nfft, hop, max_width, save_npy): path for path, output_base in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                seconds, elapsed = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(jobs)}] Error exporting {path}: {e}")
+                continue
+            total_audio += seconds
+            print(f"[{done}/{len(jobs)}] {path}: {seconds:.1f} s of audio in {elapsed:.1f} s")
+    elapsed = time.perf_counter() - start_time
+    print(f"Exported {len(jobs) - failed} spectrograms ({total_audio:.0f} s of audio) to {output_dir} in {elapsed:.1f} s, {failed} failed")
+    return failed
+
+def random_tone_mix(num_tones=5, duration_ms=1000, sample_rate=44100):
+    signals = [generate_random_tone(duration_ms, sample_rate)[0] for _ in range(num_tones)]
+    return mix_audio_signals(signals)
+
 # Function to generate and display the spectrogram
 def generate_and_display_spectrogram():
-    num_tones = 5
-    duration_ms = 1000
+    # Playback and plotting libraries are only needed here, not by code that imports the mixing functions
+    import simpleaudio as sa
+
     sample_rate = 44100
-    signals = []
-    
-    for _ in range(num_tones):
-        audio_signal, _ = generate_random_tone(duration_ms, sample_rate)
-        signals.append(audio_signal)
-    
-    # Mix the audio signals
-    mixed_signal = mix_audio_signals(signals)
+    mixed_signal = random_tone_mix(sample_rate=sample_rate)
     
     # Play the mixed audio signal
     play_obj = sa.play_buffer(mixed_signal, 1, 2, sample_rate)
     play_obj.wait_done()
     
-    # Create a spectrogram
+    image = write_spectrogram(iter_blocks(mixed_signal), len(mixed_signal))
+    show_spectrogram(image, len(mixed_signal) / sample_rate, sample_rate, "Spectrogram of Mixed Audio Signal")
+
+def show_spectrogram(image, seconds, sample_rate, title):
+    # The window only displays what the streaming engine computed
+    import matplotlib.pyplot as plt
+    top = image.columns.max()
     plt.figure(figsize=(12, 6))
-    plt.specgram(mixed_signal, Fs=sample_rate, NFFT=1024, noverlap=512, cmap='viridis')
-    plt.title("Spectrogram of Mixed Audio Signal")
+    plt.imshow(image.columns.T, origin='lower', aspect='auto', cmap='viridis', vmin=top - DYNAMIC_RANGE, vmax=top,
+               extent=[0, seconds, 0, sample_rate / 2])
+    plt.title(title)
     plt.xlabel("Time (s)")
     plt.ylabel("Frequency (Hz)")
     plt.colorbar(label="Intensity (dB)")
     plt.show()
 
-# Create the main window
-root = tk.Tk()
-root.title("Audio to Image Generator")
+def display_audio_file():
+    from tkinter import filedialog
+    path = filedialog.askopenfilename(filetypes=[("Audio files", " ".join("*" + extension for extension in AUDIO_EXTENSIONS))])
+    if not path:
+        return
+    try:
+        image, seconds, sample_rate = audio_file_to_image(path)
+    except (IOError, ValueError) as e:
+        print(f"Error reading {path}: {e}")
+        return
+    show_spectrogram(image, seconds, sample_rate, f"Spectrogram of {os.path.basename(path)}")
+
+def run_gui():
+    import tkinter as tk
+    from tkinter import ttk
+
+    # Create the main window
+    root = tk.Tk()
+    root.title("Audio to Image Generator")
+
+    # Create a button to generate a new audio-to-image visualization
+    generate_button = ttk.Button(root, text="Generate New Audio to Image", command=generate_and_display_spectrogram)
+    generate_button.pack(pady=20)
+    ttk.Button(root, text="Open Audio File", command=display_audio_file).pack(pady=(0, 20))
+
+    # Run the application
+    root.mainloop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Audio to Image Generator")
+    parser.add_argument("inputs", nargs="*", help="Audio files or directories to export spectrograms for")
+    parser.add_argument("--png", help="Write the spectrogram of one input (or a random tone mix) to this PNG")
+    parser.add_argument("--npy", help="Write the full-resolution spectrogram (frames x bins, dB) to this .npy file")
+    parser.add_argument("--output_dir", default="spectrograms", help="Where batch exports of inputs are written")
+    parser.add_argument("--save_npy", action="store_true", help="Also write a .npy next to every batch-exported PNG")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes used for batch exports")
+    parser.add_argument("--nfft", type=int, default=NFFT, help="Samples per FFT")
+    parser.add_argument("--hop", type=int, default=HOP, help="Samples between FFTs")
+    parser.add_argument("--width", type=int, default=MAX_IMAGE_WIDTH, help="Maximum PNG width in pixels")
+    args = parser.parse_args()
+    if args.nfft < 1 or args.width < 1:
+        parser.error("--nfft and --width must be at least 1")
 
-# Create a button to generate a new audio-to-image visualization
-generate_button = ttk.Button(root, text="Generate New Audio to Image", command=generate_and_display_spectrogram)
-generate_button.pack(pady=20)
+    if args.inputs and (args.png or args.npy):
+        if len(args.inputs) > 1 or os.path.isdir(args.inputs[0]):
+            parser.error("--png/--npy take a single file; use --output_dir for several")
+        try:
+            _, seconds, _ = audio_file_to_image(args.inputs[0], args.png, args.npy, args.nfft, args.hop, args.width)
+        except (IOError, ValueError) as e:
+            print(f"Error exporting {args.inputs[0]}: {e}")
+            sys.exit(1)
+        print(f"Exported {seconds:.1f} s of audio from {args.inputs[0]}")
+    elif args.inputs:
+        if export_directory(args.inputs, args.output_dir, args.nfft, args.hop, args.width, args.save_npy, args.workers):
+            sys.exit(1)
+    elif args.png or args.npy:
+        mixed_signal = random_tone_mix()
+        write_spectrogram(iter_blocks(mixed_signal), len(mixed_signal), args.png, args.npy, args.nfft, args.hop, args.width)
+    else:
+        run_gui()
 
-# Run the application
-root.mainloop()
+#python AudioToImage.py
+#python AudioToImage.py --png tones.png --npy tones.npy
+#python AudioToImage.py "R-8darbuka dum.wav" --png darbuka.png
+#python AudioToImage.py recordings/ --output_dir spectrograms --save_npy
@@ -0,0 +1,129 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+import videotoaudio
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v')
+MANIFEST_NAME = 'manifest.jsonl'
+
+def find_videos(source):
+    if os.path.isdir(source):
+        paths = [os.path.join(folder, name) for folder, _, names in os.walk(source) for name in names]
+    else:
+        paths = glob.glob(source, recursive=True)
+    return sorted(os.path.abspath(path) for path in paths if path.lower().endswith(VIDEO_EXTENSIONS))
+
+def output_path_for(video_path, base_dir, output_dir, audio_format):
+    # Mirror the input layout so clips with the same name in different folders don't collide
+    relative = os.path.relpath(video_path, base_dir)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + '.' + audio_format)
+
+def load_manifest(manifest_path):
+    # A clip counts as done only if its output is still on disk
+    completed = {}
+    if not os.path.exists(manifest_path):
+        return completed
+    with open(manifest_path) as manifest:
+        for line in manifest:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Half-written line from a crash
+            if os.path.exists(record['output']):
+                completed[record['input']] = record
+    return completed
+
+def init_worker():
+    # One clip per process already fills the cores; OpenCV's own threads would only oversubscribe them
+    cv2.setNumThreads(1)
+
+def render_one(video_path, output_path, key, scale, note_duration):
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    root, extension = os.path.splitext(output_path)
+    partial_path = root + '.partial' + extension
+    start_time = time.perf_counter()
+    try:
+        frame_count, audio_seconds = videotoaudio.render_video_to_file(video_path, partial_path, key, scale, note_duration)
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)  # Don't leave half-written renders behind
+        raise
+    os.replace(partial_path, output_path)  # Only finished renders get the real name
+    elapsed = time.perf_counter() - start_time
+    return {
+        'input': video_path,
+        'output': output_path,
+        'key': key,
+        'scale': scale,
+        'note_duration': note_duration,
+        'frames': frame_count,
+        'audio_seconds': round(audio_seconds, 3),
+        'elapsed': round(elapsed, 3),
+        'realtime_factor': round(audio_seconds / elapsed, 2) if elapsed > 0 else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a directory or glob of videos to audio files in parallel")
+    parser.add_argument("source", help="Directory of videos or a glob such as 'clips/**/*.mp4'")
+    parser.add_argument("output_dir", help="Directory for the rendered audio and the manifest")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("--format", default="wav", choices=["wav", "flac"], help="Output audio format")
+    parser.add_argument("--key", default="C", choices=list(videotoaudio.NOTES.keys()))
+    parser.add_argument("--scale", default="major", choices=list(videotoaudio.SCALES.keys()))
+    parser.add_argument("--note_duration", type=float, default=videotoaudio.DEFAULT_NOTE_DURATION, help="Seconds per note")
+    args = parser.parse_args()
+
+    videos = find_videos(args.source)
+    if not videos:
+        print(f"No videos found in {args.source}")
+        return
+
+    base_dir = os.path.commonpath([os.path.dirname(video) for video in videos])
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = os.path.join(args.output_dir, MANIFEST_NAME)
+    completed = load_manifest(manifest_path)
+    settings = {'key': args.key, 'scale': args.scale, 'note_duration': args.note_duration}
+    outputs = {video: output_path_for(video, base_dir, args.output_dir, args.format) for video in videos}
+    # A render only counts if it went to the same file (and so the same format) with the same settings
+    pending = [video for video in videos
+               if not (video in completed and completed[video]['output'] == outputs[video]
+                       and all(completed[video].get(name) == value for name, value in settings.items()))]
+    print(f"{len(videos)} videos, {len(videos) - len(pending)} already rendered, {len(pending)} to go on {args.workers} workers")
+
+    start_time = time.perf_counter()
+    total_audio = 0.0
+    failed = 0
+    with open(manifest_path, 'a') as manifest, ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+        futures = {
+            pool.submit(render_one, video, outputs[video], args.key, args.scale, args.note_duration): video
+            for video in pending
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            video = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(pending)}] Error rendering {video}: {e}")
+                continue
+            manifest.write(json.dumps(record) + "\n")
+            manifest.flush()
+            total_audio += record['audio_seconds']
+            print(f"[{done}/{len(pending)}] {video}: {record['frames']} frames in {record['elapsed']:.1f} s ({record['realtime_factor']}x real time)")
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Rendered {len(pending) - failed} videos ({total_audio:.0f} s of audio) in {elapsed:.1f} s, {failed} failed")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
+
+#python BatchSonify.py videos/ renders/ --workers 32
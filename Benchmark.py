@@ -0,0 +1,170 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+import cv2
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPEAT = 5
+REGRESSION_THRESHOLD = 0.10  # Flag anything more than 10% slower than the baseline
+FRAME_SIZES = {'480p': (854, 480), '1080p': (1920, 1080), '4k': (3840, 2160)}
+SEED = 1234
+
+def load_script(filename, name):
+    # Some scripts have spaces in their names, so they can't be imported the usual way
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def synthetic_frame(width, height, seed=SEED):
+    # A smooth gradient with noise: every frame has real colour variation but is identical across runs
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.empty((height, width, 3), dtype=np.float32)
+    frame[..., 0] = x
+    frame[..., 1] = y
+    frame[..., 2] = (x + y) / 2
+    frame += rng.normal(0, 20, frame.shape).astype(np.float32)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+def video_to_audio_benchmarks():
+    import videotoaudio
+    v5 = load_script('VideoToAudio5.py', 'VideoToAudio5')
+    duration = 1.0
+    samples = int(videotoaudio.SAMPLE_RATE * duration)
+    out = np.empty(samples)
+    key_notes = videotoaudio.get_notes_in_key('C', 'major')
+    for waveform in videotoaudio.WAVEFORMS:
+        yield f'v5.generate_note.{waveform}', 'samples/s', samples, lambda waveform=waveform: videotoaudio.generate_note(440.0, duration, waveform, out)
+        for chord_type in videotoaudio.CHORD_TYPES:
+            yield (f'v5.generate_chord.{chord_type}.{waveform}', 'samples/s', samples,
+                   lambda chord_type=chord_type, waveform=waveform: videotoaudio.generate_chord(261.63, chord_type, duration, waveform, out))
+    # A repeated chord from the cache, against synthesising it again above
+    chord_cache = videotoaudio.ChordCache()
+    yield 'v5.chord_cache.hit', 'samples/s', samples, lambda: chord_cache.get('C', 'major', 'sine', duration, 'C', 'major')
+    for size_name, (width, height) in FRAME_SIZES.items():
+        frame = synthetic_frame(width, height)
+        # process_frame draws on its frame, so each call gets a fresh copy like a decoder would hand over
+        yield f'v5.process_frame.{size_name}', 'frames/s', 1, lambda frame=frame: v5.process_frame(frame.copy(), key_notes)
+
+    # A still 1080p scene, frame plus one audio block: event mode should leave the voice silent
+    still = synthetic_frame(*FRAME_SIZES['1080p'])
+    block = np.empty(videotoaudio.CHUNK_SIZE)
+    def still_frame(detector=None):
+        v5.process_frame(still.copy(), key_notes, detector)
+        v5.voice.render(block)
+    yield 'v5.still_frame.every_frame', 'frames/s', 1, still_frame
+    yield 'v5.still_frame.events', 'frames/s', 1, lambda detector=videotoaudio.EventDetector(): still_frame(detector)
+
+def image_to_audio_benchmarks():
+    old = load_script('old image to audio 2.py', 'old_image_to_audio_2')
+    samples = 44100
+    for waveform in ['sine', 'square', 'sawtooth', 'triangle']:
+        for octaves in [1, 3]:
+            yield (f'image2.generate_chord.{waveform}.{octaves}oct', 'samples/s', samples,
+                   lambda waveform=waveform, octaves=octaves: old.generate_chord(261.63, True, waveform, '13th', octaves))
+    scale = [1, 5/4, 3/2]
+    yield 'image2.generate_melody', 'samples/s', len(scale) * int(samples / 3), lambda: old.generate_melody(261.63, scale)
+
+def audio_to_image_benchmarks():
+    a2i = load_script('AudioToImage.py', 'AudioToImage')
+    np.random.seed(SEED)
+    signals = [a2i.generate_random_tone(1000)[0] for _ in range(5)]
+    yield 'a2i.mix_audio_signals.5x1s', 'samples/s', len(signals[0]), lambda: a2i.mix_audio_signals(signals)
+    block = a2i.mix_audio_signals(signals)
+    stft = a2i.StreamingSTFT()
+    yield 'a2i.streaming_stft.1s', 'samples/s', len(block), lambda: stft.process(block)
+
+BENCHMARK_GROUPS = [video_to_audio_benchmarks, image_to_audio_benchmarks, audio_to_image_benchmarks]
+
+def measure(func, min_time):
+    # Best of REPEAT runs, each long enough for the timer to be reliable
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=REPEAT, number=number)) / number
+
+def run_benchmarks(name_filter=None, min_time=0.2):
+    results = {}
+    for group in BENCHMARK_GROUPS:
+        try:
+            benchmarks = list(group())
+        except ImportError as e:
+            print(f"Skipping {group.__name__}: {e}")
+            continue
+        for name, unit, units, func in benchmarks:
+            if name_filter and name_filter not in name:
+                continue
+            seconds = measure(func, min_time)
+            results[name] = {'unit': unit, 'rate': units / seconds, 'seconds_per_call': seconds}
+            print(f"{name:45s} {units / seconds:14,.0f} {unit}  ({seconds * 1000:.3f} ms/call)")
+    return results
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cv2_threads': cv2.getNumThreads(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def compare(results, baseline, threshold):
+    # Rates are higher-is-better, so a ratio below 1 - threshold is a regression
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['rate'] / baseline[name]['rate']
+        flag = ''
+        if ratio < 1 - threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif ratio > 1 + threshold:
+            flag = '  faster'
+        print(f"{name:45s} {ratio:6.2f}x{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the synthesis and analysis hot paths")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON file from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Fractional slowdown that counts as a regression")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--min_time", type=float, default=0.2, help="Seconds per timing run")
+    parser.add_argument("--threads", type=int, help="OpenCV thread count, for comparable runs across machines")
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+    results = run_benchmarks(args.filter, args.min_time)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+        print(f"Saved {len(results)} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions against {args.compare}")
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+if __name__ == "__main__":
+    main()
+
+#python Benchmark.py --output baseline.json
+#python Benchmark.py --compare baseline.json
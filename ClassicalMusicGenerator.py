@@ -1,18 +1,22 @@
-import music21
-import pygame
 import tempfile
 import os
 import random
 
-# Set the path to the MuseScore executable
-us = music21.environment.UserSettings()
-us['musicxmlPath'] = r'C:\Program Files\MuseScore 3\bin\MuseScore3.exe'  # Update this path
+MUSESCORE_PATH = r'C:\Program Files\MuseScore 3\bin\MuseScore3.exe'  # Update this path
 
-# Verify the path
-print("MuseScore path:", us['musicxmlPath'])
+# music21 and pygame are slow to import, so they are only loaded by the functions that use them
+def configure_musescore(path=MUSESCORE_PATH):
+    import music21
+    # Set the path to the MuseScore executable
+    us = music21.environment.UserSettings()
+    us['musicxmlPath'] = path
+
+    # Verify the path
+    print("MuseScore path:", us['musicxmlPath'])
 
 # Function to generate a random classical piano piece using music21
 def generate_random_midi():
+    import music21
     # Create streams for treble and bass clefs
     treble_stream = music21.stream.Part()
     bass_stream = music21.stream.Part()
@@ -48,6 +52,7 @@ def display_sheet_music(piece):
 
 # Function to play the MIDI file
 def play_midi(piece):
+    import pygame
     # Create a temporary MIDI file
     with tempfile.NamedTemporaryFile(delete=False, suffix=".mid") as temp_midi:
         temp_midi_path = temp_midi.name
@@ -67,11 +72,14 @@ def play_midi(piece):
     # Clean up the temporary file
     os.remove(temp_midi_path)
 
-# Generate a random MIDI piece
-piece = generate_random_midi()
+if __name__ == "__main__":
+    configure_musescore()
+
+    # Generate a random MIDI piece
+    piece = generate_random_midi()
 
-# Display the sheet music
-display_sheet_music(piece)
+    # Display the sheet music
+    display_sheet_music(piece)
 
-# Play the MIDI file
-play_midi(piece)
+    # Play the MIDI file
+    play_midi(piece)
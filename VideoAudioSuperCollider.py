@@ -3,56 +3,298 @@ import numpy as np
 import threading
 import argparse
 import time
-from pythonosc import udp_client
+import queue
+import socket
+import struct
+from pythonosc import osc_bundle_builder, osc_message_builder
+from pythonosc.osc_message import OscMessage
 import subprocess
 import atexit
 
 # Constants
 SAMPLE_RATE = 44100
+OSC_LOOKAHEAD = 0.05  # Bundles are time-tagged this far ahead so scsynth can place them sample-accurately
+VOICE_POOL_SIZE = 16  # Synth nodes kept alive on the server, the most that can ever sound at once
+FIRST_NODE_ID = 1000  # scsynth reserves the low IDs for the root and default groups
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 57110
+SERVER_START_TIMEOUT = 10  # Seconds to wait for scsynth to answer /status
+STATUS_INTERVAL = 5  # Seconds between server load reports
 
 # Global variables
-osc_client = None
-sc_server_process = None
-
-def start_supercollider_server():
-    global sc_server_process
-    sc_server_process = subprocess.Popen(["scsynth", "-u", "57110"])
-    time.sleep(2)  # Give some time for the server to start
-
-def stop_supercollider_server():
-    global sc_server_process
-    if sc_server_process:
-        sc_server_process.terminate()
-        sc_server_process.wait()
-
-atexit.register(stop_supercollider_server)
-
-def setup_supercollider():
-    global osc_client
-    start_supercollider_server()
-    osc_client = udp_client.SimpleUDPClient("127.0.0.1", 57110)
-    
-    # Define a simple synth
-    synth_def = """
-    SynthDef(\colorTone, { |freq = 440, amp = 0.1, gate = 1|
-        var sig, env;
-        env = EnvGen.kr(Env.adsr(0.01, 0.1, 0.5, 0.1), gate, doneAction: 2);
-        sig = SinOsc.ar(freq) * env * amp;
-        Out.ar(0, sig ! 2);
-    }).add;
-    """
-    
-    osc_client.send_message("/d_recv", [synth_def])
+session = None
+osc_sender = None
+voice_pool = None
+
+def pstring(text):
+    data = text.encode('ascii')
+    return struct.pack('>B', len(data)) + data
+
+def build_color_tone_synthdef():
+    # colorTone compiled by hand to the SCgf version 2 binary that /d_recv expects:
+    # SynthDef(\colorTone, { |freq = 440, amp = 0.1, sustain = 0.1, t_trig = 0|
+    #     var env = EnvGen.kr(Env.linen(0.01, sustain, 0.1), t_trig);
+    #     Out.ar(0, (SinOsc.ar(freq) * env * amp) ! 2);
+    # })
+    # The envelope restarts on every t_trig and the node never frees itself, so VoicePool can reuse it.
+    constants = [0.0, 1.0, 3.0, -99.0, 0.01, 0.1]
+    params = [('freq', 440.0), ('amp', 0.1), ('sustain', 0.1), ('t_trig', 0.0)]
+
+    def const(value):
+        return (-1, constants.index(value))
+
+    control_rate, audio_rate = 1, 2
+    multiply = 2  # BinaryOpUGen special index for *
+    # (class name, rate, inputs as (ugen index, output index), number of outputs, special index)
+    ugens = [
+        ('Control', control_rate, [], 3, 0),
+        ('TrigControl', control_rate, [], 1, 3),
+        ('SinOsc', audio_rate, [(0, 0), const(0.0)], 1, 0),
+        ('EnvGen', control_rate, [(1, 0), const(1.0), const(0.0), const(1.0), const(0.0),
+                                  # Env: initial level, stages, release node, loop node, then level/time/shape/curve per stage
+                                  const(0.0), const(3.0), const(-99.0), const(-99.0),
+                                  const(1.0), const(0.01), const(1.0), const(0.0),
+                                  const(1.0), (0, 2), const(1.0), const(0.0),
+                                  const(0.0), const(0.1), const(1.0), const(0.0)], 1, 0),
+        ('BinaryOpUGen', audio_rate, [(2, 0), (3, 0)], 1, multiply),
+        ('BinaryOpUGen', audio_rate, [(4, 0), (0, 1)], 1, multiply),
+        ('Out', audio_rate, [const(0.0), (5, 0), (5, 0)], 0, 0),
+    ]
+
+    data = b'SCgf' + struct.pack('>ih', 2, 1) + pstring('colorTone')
+    data += struct.pack('>i', len(constants)) + struct.pack(f'>{len(constants)}f', *constants)
+    data += struct.pack('>i', len(params)) + struct.pack(f'>{len(params)}f', *(value for _, value in params))
+    data += struct.pack('>i', len(params))
+    for index, (name, _) in enumerate(params):
+        data += pstring(name) + struct.pack('>i', index)
+    data += struct.pack('>i', len(ugens))
+    for name, rate, inputs, num_outputs, special_index in ugens:
+        data += pstring(name) + struct.pack('>biih', rate, len(inputs), num_outputs, special_index)
+        for ugen_index, output_index in inputs:
+            data += struct.pack('>ii', ugen_index, output_index)
+        data += struct.pack('>b', rate) * num_outputs
+    return data + struct.pack('>h', 0)  # No variants
+
+class ScsynthSession:
+    # One scsynth for the whole process (or several, with keep_server): reuses a server that
+    # already answers on the port, otherwise launches one and waits until it replies to /status
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, keep_server=False):
+        self.address = (host, port)
+        self.keep_server = keep_server
+        self.process = None
+        self.synthdef_loaded = False
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("", 0))
+
+    def send(self, content):
+        self.sock.sendto(content.dgram, self.address)
+
+    def send_message(self, address, args):
+        builder = osc_message_builder.OscMessageBuilder(address=address)
+        for arg in args:
+            builder.add_arg(arg)
+        self.send(builder.build())
+
+    def wait_for(self, addresses, timeout):
+        # Returns the first reply whose address is in addresses, or None on timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self.sock.settimeout(remaining)
+            try:
+                data, _ = self.sock.recvfrom(65536)
+            except (socket.timeout, ConnectionError):
+                continue
+            try:
+                message = OscMessage(data)
+            except Exception:
+                continue  # Bundles and anything else we didn't ask for
+            if message.address == '/fail':
+                raise RuntimeError(f"scsynth failed: {message.params}")
+            if message.address in addresses:
+                return message
+
+    def status(self, timeout=1.0):
+        self.send_message("/status", [])
+        reply = self.wait_for(('/status.reply',), timeout)
+        if reply is None:
+            return None
+        _, ugens, synths, groups, synthdefs, avg_cpu, peak_cpu, nominal_rate, actual_rate = reply.params[:9]
+        return {'ugens': ugens, 'synths': synths, 'groups': groups, 'synthdefs': synthdefs,
+                'avg_cpu': avg_cpu, 'peak_cpu': peak_cpu, 'nominal_rate': nominal_rate, 'actual_rate': actual_rate}
+
+    def start(self, timeout=SERVER_START_TIMEOUT):
+        if self.status(timeout=0.2) is not None:
+            print(f"Reusing scsynth on port {self.address[1]}")
+            return
+        self.process = subprocess.Popen(["scsynth", "-u", str(self.address[1])])
+
+        # Poll instead of sleeping a fixed time: ready as soon as the server answers
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"scsynth exited with code {self.process.returncode}")
+            if self.status(timeout=0.05) is not None:
+                return
+        raise TimeoutError(f"scsynth did not answer /status within {timeout} s")
+
+    def load_synthdef(self, synthdef, timeout=2.0):
+        if self.synthdef_loaded:
+            return
+        self.send_message("/d_recv", [synthdef])
+        if self.wait_for(('/done',), timeout) is None:
+            raise TimeoutError("scsynth did not confirm /d_recv")
+        self.synthdef_loaded = True
+
+    def report(self):
+        status = self.status()
+        if status is None:
+            print("Server: no /status reply")
+        else:
+            print(f"Server: avg CPU {status['avg_cpu']:.1f}%, peak CPU {status['peak_cpu']:.1f}%, "
+                  f"{status['synths']} synths, {status['ugens']} ugens")
+        return status
+
+    def close(self):
+        if self.process is not None and not self.keep_server:
+            self.process.terminate()
+            self.process.wait()
+        self.sock.close()
+
+def build_bundle(messages):
+    # One datagram: an outer bundle holding a nested, time-tagged bundle per distinct timestamp
+    by_time = {}
+    for when, address, args in messages:
+        builder = osc_message_builder.OscMessageBuilder(address=address)
+        for arg in args:
+            builder.add_arg(arg)
+        by_time.setdefault(when, []).append(builder.build())
 
-def play_note(freq, duration):
-    global osc_client
-    synth_id = int(time.time() * 1000) % 1000000  # Generate a unique ID
-    osc_client.send_message("/s_new", ["colorTone", synth_id, 0, 0, "freq", freq])
-    threading.Timer(duration, stop_note, [synth_id]).start()
+    times = sorted(by_time)
+    outer = osc_bundle_builder.OscBundleBuilder(times[0])
+    for when in times:
+        inner = osc_bundle_builder.OscBundleBuilder(when)
+        for message in by_time[when]:
+            inner.add_content(message)
+        outer.add_content(inner.build())
+    return outer.build()
 
-def stop_note(synth_id):
-    global osc_client
-    osc_client.send_message("/n_set", [synth_id, "gate", 0])
+class OscSender:
+    # Collects a video frame's messages and sends them from one thread as a single datagram
+    def __init__(self, client):
+        self.client = client
+        self.pending = []
+        self.frames = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def schedule(self, when, address, args):
+        self.pending.append((when, address, args))
+
+    def flush(self):
+        if self.pending:
+            self.frames.put(self.pending)
+            self.pending = []
+
+    def run(self):
+        while True:
+            messages = self.frames.get()
+            if messages is None:
+                break
+            try:
+                self.client.send(build_bundle(messages))
+            except Exception as e:
+                print(f"Error sending OSC bundle: {e}")
+
+    def close(self):
+        self.flush()
+        self.frames.put(None)
+        self.thread.join()
+
+class NodeIdAllocator:
+    # Node IDs must be unique among live nodes on the server; released IDs are handed out again
+    def __init__(self, first_id=FIRST_NODE_ID):
+        self.next_id = first_id
+        self.free_ids = []
+        self.lock = threading.Lock()
+
+    def allocate(self):
+        with self.lock:
+            if self.free_ids:
+                return self.free_ids.pop()
+            node_id = self.next_id
+            self.next_id += 1
+            return node_id
+
+    def release(self, node_id):
+        with self.lock:
+            self.free_ids.append(node_id)
+
+class VoicePool:
+    # A fixed set of long-lived colorTone nodes. Each note is a single /n_set that retriggers
+    # the envelope for `sustain` seconds, so no note ever needs its own node or a note-off.
+    def __init__(self, sender, allocator, size=VOICE_POOL_SIZE, steal=True):
+        self.sender = sender
+        self.allocator = allocator
+        self.steal = steal
+        self.node_ids = [allocator.allocate() for _ in range(size)]
+        self.started = [0.0] * size
+        self.busy_until = [0.0] * size
+        self.stolen = 0
+        self.dropped = 0
+
+    def create_nodes(self):
+        for node_id in self.node_ids:
+            self.sender.schedule(osc_bundle_builder.IMMEDIATELY, "/s_new", ["colorTone", node_id, 0, 0])
+        self.sender.flush()
+
+    def free_nodes(self):
+        self.sender.schedule(osc_bundle_builder.IMMEDIATELY, "/n_free", list(self.node_ids))
+        self.sender.flush()
+        for node_id in self.node_ids:
+            self.allocator.release(node_id)
+
+    def active(self, at_time=None):
+        at_time = time.time() if at_time is None else at_time
+        return sum(1 for end in self.busy_until if end > at_time)
+
+    def note_on(self, freq, duration, start_time):
+        free = [voice for voice, end in enumerate(self.busy_until) if end <= start_time]
+        if free:
+            voice = free[0]
+        elif self.steal:
+            voice = min(range(len(self.node_ids)), key=lambda index: self.started[index])  # Oldest note
+            self.stolen += 1
+        else:
+            self.dropped += 1
+            return None
+
+        self.started[voice] = start_time
+        self.busy_until[voice] = start_time + duration
+        node_id = self.node_ids[voice]
+        self.sender.schedule(start_time, "/n_set", [node_id, "freq", freq, "sustain", duration, "t_trig", 1])
+        return node_id
+
+def setup_supercollider(host=SERVER_HOST, port=SERVER_PORT, keep_server=False):
+    global session, osc_sender, voice_pool
+    session = ScsynthSession(host, port, keep_server)
+    atexit.register(session.close)
+    session.start()
+    session.load_synthdef(build_color_tone_synthdef())
+
+    osc_sender = OscSender(session)
+    atexit.register(osc_sender.close)
+    voice_pool = VoicePool(osc_sender, NodeIdAllocator())
+    voice_pool.create_nodes()
+    atexit.register(voice_pool.free_nodes)
+
+def play_note(freq, duration, start_time=None):
+    # Scheduled on the server clock; returns None if the pool was full and stealing is off
+    if start_time is None:
+        start_time = time.time() + OSC_LOOKAHEAD
+    return voice_pool.note_on(freq, duration, start_time)
 
 def resize_frame(frame, max_size=500):
     height, width = frame.shape[:2]
@@ -80,6 +322,10 @@ def process_video(video_path, note_duration):
         fps = cap.get(cv2.CAP_PROP_FPS)
         frame_duration = 1 / fps
         
+        # Notes are timed from the frame position, not from when Python got round to them
+        start_time = time.time() + OSC_LOOKAHEAD
+        frame_index = 0
+        last_report = time.monotonic()
         while True:
             ret, frame = cap.read()
             if not ret:
@@ -88,8 +334,19 @@ def process_video(video_path, note_duration):
             frame = resize_frame(frame)
             r, g, b = get_average_color(frame)
             
+            note_time = start_time + frame_index * frame_duration
+            if note_time < time.time():
+                # Fell behind: re-anchor rather than send bundles that are already late
+                start_time = time.time() + OSC_LOOKAHEAD - frame_index * frame_duration
+                note_time = start_time + frame_index * frame_duration
             frequency = color_to_note(r, g, b)
-            play_note(frequency, note_duration)
+            play_note(frequency, note_duration, note_time)
+            osc_sender.flush()
+            frame_index += 1
+
+            if time.monotonic() - last_report >= STATUS_INTERVAL:
+                session.report()
+                last_report = time.monotonic()
 
             cv2.imshow('Video', frame)
             if cv2.waitKey(int(frame_duration * 1000)) & 0xFF == ord('q'):
@@ -104,14 +361,21 @@ def process_video(video_path, note_duration):
         if 'cap' in locals():
             cap.release()
         cv2.destroyAllWindows()
+        if voice_pool is not None:
+            print(f"Voices: {voice_pool.active()} active, {voice_pool.stolen} stolen, {voice_pool.dropped} dropped")
+        if session is not None:
+            session.report()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Video to Audio Processor using SuperCollider")
-    parser.add_argument("video_path", help="Path to the input video file")
+    parser.add_argument("video_paths", nargs="+", help="Paths to the input video files, played one after another")
     parser.add_argument("--note_duration", type=float, default=0.1, help="Duration of each note in seconds")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="scsynth UDP port")
+    parser.add_argument("--keep_server", action="store_true", help="Leave scsynth running for the next run to reuse")
     args = parser.parse_args()
     
-    setup_supercollider()
+    setup_supercollider(port=args.port, keep_server=args.keep_server)
 
-    # Process video
-    process_video(args.video_path, args.note_duration)
\ No newline at end of file
+    # Process videos on the one server session
+    for video_path in args.video_paths:
+        process_video(video_path, args.note_duration)
\ No newline at end of file
@@ -7,6 +7,8 @@ import time
 import tkinter as tk
 from tkinter import filedialog, ttk
 
+from videotoaudio.synth import ChordCache
+
 # Constants
 CHUNK_SIZE = 1024
 SAMPLE_RATE = 44100
@@ -99,6 +101,9 @@ def generate_chord(base_freq, chord_type, duration, waveform='sine'):
         chord += generate_note(freq, duration, waveform)
     return chord / 3  # Normalize amplitude
 
+# Only a few hundred note/chord/waveform combinations exist, so each is synthesised once
+chord_cache = ChordCache(render=generate_chord)
+
 def color_to_chord(r, g, b, key_notes):
     h, s, v = cv2.cvtColor(np.uint8([[[b, g, r]]]), cv2.COLOR_RGB2HSV)[0][0]
     note_index = int(h / 180 * len(key_notes))
@@ -120,7 +125,7 @@ def process_frame(frame, key_notes):
     r, g, b = get_average_color(frame)
     
     base_freq, chord_type, waveform, base_note = color_to_chord(r, g, b, key_notes)
-    audio_chunk = generate_chord(base_freq, chord_type, note_duration, waveform)
+    audio_chunk = chord_cache.get(base_note, chord_type, waveform, note_duration, current_key, current_scale)
     
     try:
         audio_queue.put(audio_chunk, block=False)
@@ -201,44 +206,48 @@ def stop_processing():
 def update_key(new_key):
     global current_key
     current_key = new_key
+    chord_cache.clear()  # Chords cached for the old key will never be asked for again
 
 def update_scale(new_scale):
     global current_scale
     current_scale = new_scale
+    chord_cache.clear()
 
 def update_duration(new_duration):
     global note_duration
     note_duration = float(new_duration)
+    chord_cache.clear()
 
-# Create main window
-root = tk.Tk()
-root.title("Video to Audio Converter")
+if __name__ == "__main__":
+    # Create main window
+    root = tk.Tk()
+    root.title("Video to Audio Converter")
 
-# Create and pack widgets
-frame = ttk.Frame(root, padding="10")
-frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+    # Create and pack widgets
+    frame = ttk.Frame(root, padding="10")
+    frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
-ttk.Button(frame, text="Select Video", command=select_video_source).grid(column=0, row=0, padx=5, pady=5)
-ttk.Button(frame, text="Use Webcam", command=use_webcam).grid(column=1, row=0, padx=5, pady=5)
+    ttk.Button(frame, text="Select Video", command=select_video_source).grid(column=0, row=0, padx=5, pady=5)
+    ttk.Button(frame, text="Use Webcam", command=use_webcam).grid(column=1, row=0, padx=5, pady=5)
 
-ttk.Label(frame, text="Key:").grid(column=0, row=1, padx=5, pady=5)
-key_var = tk.StringVar(value="C")
-ttk.Combobox(frame, textvariable=key_var, values=list(NOTES.keys()), state="readonly", width=5).grid(column=1, row=1, padx=5, pady=5)
-key_var.trace("w", lambda *args: update_key(key_var.get()))
+    ttk.Label(frame, text="Key:").grid(column=0, row=1, padx=5, pady=5)
+    key_var = tk.StringVar(value="C")
+    ttk.Combobox(frame, textvariable=key_var, values=list(NOTES.keys()), state="readonly", width=5).grid(column=1, row=1, padx=5, pady=5)
+    key_var.trace("w", lambda *args: update_key(key_var.get()))
 
-ttk.Label(frame, text="Scale:").grid(column=2, row=1, padx=5, pady=5)
-scale_var = tk.StringVar(value="major")
-ttk.Combobox(frame, textvariable=scale_var, values=list(SCALES.keys()), state="readonly", width=10).grid(column=3, row=1, padx=5, pady=5)
-scale_var.trace("w", lambda *args: update_scale(scale_var.get()))
+    ttk.Label(frame, text="Scale:").grid(column=2, row=1, padx=5, pady=5)
+    scale_var = tk.StringVar(value="major")
+    ttk.Combobox(frame, textvariable=scale_var, values=list(SCALES.keys()), state="readonly", width=10).grid(column=3, row=1, padx=5, pady=5)
+    scale_var.trace("w", lambda *args: update_scale(scale_var.get()))
 
-ttk.Label(frame, text="Note Duration:").grid(column=0, row=2, padx=5, pady=5)
-duration_var = tk.StringVar(value="0.1")
-ttk.Entry(frame, textvariable=duration_var, width=5).grid(column=1, row=2, padx=5, pady=5)
-duration_var.trace("w", lambda *args: update_duration(duration_var.get()))
+    ttk.Label(frame, text="Note Duration:").grid(column=0, row=2, padx=5, pady=5)
+    duration_var = tk.StringVar(value="0.1")
+    ttk.Entry(frame, textvariable=duration_var, width=5).grid(column=1, row=2, padx=5, pady=5)
+    duration_var.trace("w", lambda *args: update_duration(duration_var.get()))
 
-start_button = ttk.Button(frame, text="Start", command=start_processing, state=tk.DISABLED)
-start_button.grid(column=0, row=3, columnspan=2, padx=5, pady=5)
+    start_button = ttk.Button(frame, text="Start", command=start_processing, state=tk.DISABLED)
+    start_button.grid(column=0, row=3, columnspan=2, padx=5, pady=5)
 
-root.mainloop()
+    root.mainloop()
 
 #python VideoToAudio4.py
\ No newline at end of file
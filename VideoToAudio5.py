@@ -1,84 +1,56 @@
 import cv2
-import numpy as np
-import pyaudio
 import threading
-import queue
 import time 
-import tkinter as tk
-from tkinter import filedialog, ttk
-
-# Constants
-CHUNK_SIZE = 1024
-SAMPLE_RATE = 44100
-BUFFER_SIZE = 20
-FRAME_BUFFER_SIZE = 5
-
-# Global audio queue
-audio_queue = queue.Queue(maxsize=BUFFER_SIZE)
-frame_buffer = queue.Queue(maxsize=FRAME_BUFFER_SIZE)
-
-# Define notes and their frequencies
-NOTES = {
-    'C': 261.63, 'C#': 277.18, 'D': 293.66, 'D#': 311.13, 'E': 329.63, 'F': 349.23,
-    'F#': 369.99, 'G': 392.00, 'G#': 415.30, 'A': 440.00, 'A#': 466.16, 'B': 493.88
-}
-
-# Define scales (patterns of whole and half steps)
-SCALES = {
-    'major': [0, 2, 4, 5, 7, 9, 11],
-    'natural_minor': [0, 2, 3, 5, 7, 8, 10],
-    'harmonic_minor': [0, 2, 3, 5, 7, 8, 11],
-    'melodic_minor': [0, 2, 3, 5, 7, 9, 11],
-    'dorian': [0, 2, 3, 5, 7, 9, 10],
-    'phrygian': [0, 1, 3, 5, 7, 8, 10],
-    'lydian': [0, 2, 4, 6, 7, 9, 11],
-    'mixolydian': [0, 2, 4, 5, 7, 9, 10],
-    'locrian': [0, 1, 3, 5, 6, 8, 10],
-    'pentatonic_major': [0, 2, 4, 7, 9],
-    'pentatonic_minor': [0, 3, 5, 7, 10],
-    'blues': [0, 3, 5, 6, 7, 10]
-}
-
-# Define common chord types
-CHORD_TYPES = {
-    'major': [0, 4, 7],
-    'minor': [0, 3, 7],
-    'diminished': [0, 3, 6],
-    'augmented': [0, 4, 8],
-    'sus4': [0, 5, 7],
-    'sus2': [0, 2, 7],
-    '7th': [0, 4, 7, 10],
-    'm7': [0, 3, 7, 10],
-    'maj7': [0, 4, 7, 11]
-}
+import argparse
+
+from videotoaudio.music import NOTES, SCALES
+from videotoaudio.synth import CHUNK_SIZE, SAMPLE_RATE, SynthVoice, VoiceBank
+from videotoaudio.analysis import (TILE_GRIDS, EventDetector, open_capture, analyze_frame, apply_event, color_to_chord, draw_overlay,
+                                   retune_tiles, set_tile_voices)
+from videotoaudio.pipeline import (FRAME_BUFFER_SIZE, ANALYSIS_WORKERS, DECODE_DROP_POLICY, RESULT_DROP_POLICY, STATS_INTERVAL,
+                                   StageQueue, StageStats, report_pipeline, AudioClock, AVSync, MAX_LATENESS,
+                                   PipelineMetrics, MetricsLog, decode_frames, analyze_frames)
+from videotoaudio.output import OUTPUT_LATENCY_BLOCKS, SINK_CHOICES, RingBuffer, open_output_stream
+from videotoaudio.params import ParameterStore
+from videotoaudio.render import render_video_to_file, play_video_to_sink
+from videotoaudio.session import run_sessions
+
+OVERLAY_INTERVAL = 1  # Seconds between timing overlay refreshes
 
 # Global variables for GUI control
-current_key = 'C'
-current_scale = 'major'
-note_duration = 0.1
+params = ParameterStore()  # Key, scale and note duration, changed live from the GUI
 is_playing = False
 video_source = None
+tile_grid = None  # (rows, cols) to give every tile of the frame its own voice
+metrics_path = None  # CSV or JSON-lines file the live pipeline appends timings to
+show_metrics = False
+event_mode = False  # Only start notes when the picture moves or changes colour
 
-def get_notes_in_key(key, scale_type='major'):
-    start_index = list(NOTES.keys()).index(key)
-    scale_pattern = SCALES[scale_type]
-    return [list(NOTES.keys())[(start_index + interval) % 12] for interval in scale_pattern]
+output_ring = RingBuffer(CHUNK_SIZE * OUTPUT_LATENCY_BLOCKS)
+audio_clock = AudioClock(output_ring)
+pipeline_metrics = PipelineMetrics()
 
 def play_audio():
     global is_playing
-    p = pyaudio.PyAudio()
-    stream = p.open(format=pyaudio.paFloat32,
-                    channels=1,
-                    rate=SAMPLE_RATE,
-                    output=True,
-                    frames_per_buffer=CHUNK_SIZE)
+    # Tiled analysis drives the stereo voice bank, otherwise the single mono voice
+    source = voice_bank if voice_bank is not None else voice
+    channels = audio_clock.channels
+    block_samples = CHUNK_SIZE * channels
+    p, stream = open_output_stream(output_ring, channels, pipeline_metrics)
     
+    # Keep the ring topped up; blocks always start on a CHUNK_SIZE boundary so they never wrap
+    block_time = CHUNK_SIZE / SAMPLE_RATE
     while is_playing:
         try:
-            chunk = audio_queue.get(timeout=1)
-            stream.write(chunk.astype(np.float32).tobytes())
-        except queue.Empty:
-            continue
+            region, _ = output_ring.write_regions(block_samples)
+            if len(region) < block_samples:
+                time.sleep(block_time / 2)
+                continue
+            retune_voices()
+            start = time.perf_counter()
+            source.render(region.reshape(CHUNK_SIZE, channels) if channels > 1 else region)
+            pipeline_metrics.record('synth', time.perf_counter() - start)
+            output_ring.commit(block_samples)
         except Exception as e:
             print(f"Error in audio playback: {e}")
             break
@@ -86,109 +58,184 @@ def play_audio():
     stream.stop_stream()
     stream.close()
     p.terminate()
-
-def resize_frame(frame, max_size=500):
-    height, width = frame.shape[:2]
-    scale = max_size / max(height, width)
-    return cv2.resize(frame, (int(width * scale), int(height * scale)))
-
-def get_average_color(frame):
-    return cv2.mean(frame)[:3][::-1]  # Convert BGR to RGB
-
-def generate_note(frequency, duration, waveform='sine'):
-    t = np.linspace(0, duration, int(SAMPLE_RATE * duration), False)
-    if waveform == 'sine':
-        return np.sin(2 * np.pi * frequency * t)
-    elif waveform == 'square':
-        return np.sign(np.sin(2 * np.pi * frequency * t))
-    elif waveform == 'sawtooth':
-        return 2 * (t * frequency - np.floor(0.5 + t * frequency))
+    print(f"Audio output: {output_ring.underruns} underruns, {output_ring.overruns} overruns")
+
+voice = SynthVoice()
+voice_bank = None
+last_analysis = None  # Most recent frame applied to the voices, kept so a key change can re-map it
+apply_lock = threading.RLock()
+
+def current_analysis(rgb, chord, tiles, analyzed_with):
+    # Parameters may have changed after this frame was analysed: re-map it rather than play the old key
+    current = params.snapshot()
+    if analyzed_with is not current:
+        chord = color_to_chord(*rgb, current.key_notes)
+        if tiles is not None:
+            tiles = retune_tiles(tiles, len(current.key_notes))
+    return current, chord, tiles
+
+def apply_analysis(rgb, chord, tiles, grid, analyzed_with):
+    # Sets the voices from one frame using the current parameters and returns the chord that plays
+    global last_analysis
+    with apply_lock:
+        current, chord, tiles = current_analysis(rgb, chord, tiles, analyzed_with)
+        if tiles is not None:
+            set_tile_voices(voice_bank, tiles, current.key_freqs, grid)
+        else:
+            base_freq, chord_type, waveform, base_note = chord
+            voice.set_chord(base_freq, chord_type, waveform)
+        last_analysis = (rgb, chord, tiles, grid, current)
+    return chord
+
+def retune_voices():
+    # Called by the audio thread before every block, so a key or scale change is heard within one block
+    if last_analysis is None or last_analysis[-1] is params.snapshot():
+        return
+    with apply_lock:
+        if last_analysis[-1] is not params.snapshot():
+            apply_analysis(*last_analysis)
+
+def process_frame(frame, key_notes, detector=None):
+    frame, rgb, chord = analyze_frame(frame, key_notes)
+    if detector is not None:
+        apply_event(voice, detector, frame, rgb, chord, None, None, None, time.perf_counter(), params.snapshot().note_duration)
     else:
-        return np.sin(2 * np.pi * frequency * t)  # Default to sine
-
-def generate_chord(base_freq, chord_type, duration, waveform='sine'):
-    chord = np.zeros(int(SAMPLE_RATE * duration))
-    for interval in CHORD_TYPES[chord_type]:
-        freq = base_freq * (2 ** (interval / 12))
-        chord += generate_note(freq, duration, waveform)
-    return chord / 3  # Normalize amplitude
-
-def color_to_chord(r, g, b, key_notes):
-    h, s, v = cv2.cvtColor(np.uint8([[[b, g, r]]]), cv2.COLOR_RGB2HSV)[0][0]
-    note_index = int(h / 180 * len(key_notes))
-    base_note = key_notes[note_index]
-    base_freq = NOTES[base_note]
-
-    chord_types = list(CHORD_TYPES.keys())
-    chord_index = int(s / 255 * len(chord_types))
-    chord_type = chord_types[chord_index]
-
-    waveforms = ['sine', 'square', 'sawtooth']
-    waveform_index = int(v / 255 * len(waveforms))
-    waveform = waveforms[waveform_index]
-
-    return base_freq, chord_type, waveform, base_note
-
-def process_frame(frame, key_notes):
-    frame = resize_frame(frame)
-    r, g, b = get_average_color(frame)
-    
-    base_freq, chord_type, waveform, base_note = color_to_chord(r, g, b, key_notes)
-    audio_chunk = generate_chord(base_freq, chord_type, note_duration, waveform)
-    
-    try:
-        audio_queue.put(audio_chunk, block=False)
-    except queue.Full:
-        audio_queue.get()
-        audio_queue.put(audio_chunk)
-    
-    cv2.putText(frame, f"Chord: {base_note} {chord_type}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-    cv2.putText(frame, f"RGB: ({int(r)}, {int(g)}, {int(b)})", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-    cv2.putText(frame, f"Waveform: {waveform}", (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-    
-    return frame
+        base_freq, chord_type, waveform, base_note = chord
+        voice.set_chord(base_freq, chord_type, waveform)
+    return draw_overlay(frame, rgb, chord)
 
 def process_video():
-    global is_playing, video_source
-    key_notes = get_notes_in_key(current_key, current_scale)
+    global is_playing, video_source, last_analysis
+    last_analysis = None
+    grid = tile_grid if voice_bank is not None else None
+    detector = EventDetector() if event_mode else None
+    metrics = pipeline_metrics
+    metrics_log = None
+    cap = None
+    stop_event = threading.Event()
+    decode_done = threading.Event()
+    threads = []
     
     try:
         if isinstance(video_source, str):
-            cap = cv2.VideoCapture(video_source)
+            cap = open_capture(video_source)
         else:
-            cap = cv2.VideoCapture(0)  # Use default camera
+            cap = open_capture(0)  # Use default camera
         
         if not cap.isOpened():
             raise IOError(f"Cannot open video source")
         
         fps = cap.get(cv2.CAP_PROP_FPS)
         frame_duration = 1 / fps if fps > 0 else 1/30
-        
+        sync = AVSync(audio_clock) if isinstance(video_source, str) else None
+        if metrics_path:
+            metrics_log = MetricsLog(metrics_path)
+
+        def counters():
+            return {
+                'decode_dropped': frames.dropped,
+                'analyze_dropped': results.dropped,
+                'sync_decode_dropped': sync.decode_dropped if sync is not None else 0,
+                'sync_display_dropped': sync.render_dropped if sync is not None else 0,
+                'underruns': output_ring.underruns,
+                'overruns': output_ring.overruns,
+            }
+
+        def report():
+            report_pipeline([decode_stats, analyze_stats, render_stats], {"decode": frames, "analyze": results}, sync)
+            if metrics_log is not None:
+                metrics_log.write(metrics.row(counters()))
+
+        frames = StageQueue(FRAME_BUFFER_SIZE, DECODE_DROP_POLICY)
+        results = StageQueue(FRAME_BUFFER_SIZE, RESULT_DROP_POLICY)
+        decode_stats, analyze_stats, render_stats = StageStats("decode"), StageStats("analyze"), StageStats("render")
+
+        def run_decoder():
+            try:
+                decode_frames(cap, frames, decode_stats, stop_event, frame_duration, lambda: params.snapshot().note_duration, sync, metrics)
+            finally:
+                decode_done.set()
+
+        decoder = threading.Thread(target=run_decoder, daemon=True)
+        workers = [threading.Thread(target=analyze_frames, args=(frames, results, analyze_stats, stop_event, decode_done, params, grid, metrics), daemon=True)
+                   for _ in range(ANALYSIS_WORKERS)]
+        threads = [decoder] + workers
+        for thread in threads:
+            thread.start()
+
+        # Render stage: workers can finish out of order, so stale frames are skipped
+        last_index = -1
+        last_report = time.perf_counter()
+        last_overlay = 0.0
+        metric_lines = []
         while is_playing:
-            ret, frame = cap.read()
-            if not ret:
+            waited = time.perf_counter()
+            item = results.get()
+            if item is None:
+                if not any(worker.is_alive() for worker in workers):
+                    break
+                continue
+            metrics.record('result_wait', time.perf_counter() - waited)
+
+            index, pts, frame, rgb, chord, tiles, analyzed_with = item
+            if index < last_index:
+                continue
+            last_index = index
+
+            # Hold each chord until the audio clock reaches its frame
+            late = False
+            if sync is not None:
+                sync.wait_until_due(pts, should_wait=lambda: is_playing)
+                drift = sync.lateness(pts)
+                sync.record(drift)
+                late = drift > MAX_LATENESS
+
+            start = time.perf_counter()
+            if detector is not None:
+                # Key changes are picked up by the next note, so last_analysis is never held
+                current, chord, tiles = current_analysis(rgb, chord, tiles, analyzed_with)
+                apply_event(voice_bank if tiles is not None else voice, detector, frame, rgb, chord, tiles,
+                            current.key_freqs, grid, audio_clock.write_time(), current.note_duration)
+            else:
+                chord = apply_analysis(rgb, chord, tiles, grid, analyzed_with)
+            if late:
+                sync.render_dropped += 1  # The chord still plays, only the picture is skipped
+                key = -1
+            else:
+                if show_metrics and start - last_overlay >= OVERLAY_INTERVAL:
+                    metric_lines = metrics.overlay_lines()
+                    last_overlay = start
+                cv2.imshow('Video', draw_overlay(frame, rgb, chord, metric_lines if show_metrics else ()))
+                key = cv2.waitKey(1) & 0xFF
+            elapsed = time.perf_counter() - start
+            render_stats.record(elapsed)
+            metrics.record('display', elapsed)
+            if key == ord('q'):
                 break
 
-            frame_buffer.put(frame)
-            if frame_buffer.full():
-                frame_to_process = frame_buffer.get()
-                processed_frame = process_frame(frame_to_process, key_notes)
-                cv2.imshow('Video', processed_frame)
-                
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+            if start - last_report >= STATS_INTERVAL:
+                report()
+                last_report = start
 
-            time.sleep(max(0, frame_duration - note_duration))
+        report()
 
     except Exception as e:
         print(f"Error processing video: {e}")
     finally:
-        cap.release()
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=1)
+        if cap is not None:
+            cap.release()
         cv2.destroyAllWindows()
+        if metrics_log is not None:
+            metrics_log.close()
         is_playing = False
 
 def select_video_source():
     global video_source
+    import tkinter as tk
+    from tkinter import filedialog
     file_path = filedialog.askopenfilename(filetypes=[("Video files", "*.mp4 *.avi *.mov")])
     if file_path:
         video_source = file_path
@@ -196,13 +243,19 @@ def select_video_source():
 
 def use_webcam():
     global video_source
+    import tkinter as tk
     video_source = 0  # Use default camera
     start_button.config(state=tk.NORMAL)
 
 def start_processing():
-    global is_playing
+    global is_playing, voice_bank, output_ring, audio_clock, pipeline_metrics
     if not is_playing:
+        pipeline_metrics = PipelineMetrics()
         is_playing = True
+        voice_bank = VoiceBank(tile_grid[0] * tile_grid[1]) if tile_grid else None
+        channels = 2 if voice_bank is not None else 1
+        output_ring = RingBuffer(CHUNK_SIZE * channels * OUTPUT_LATENCY_BLOCKS)
+        audio_clock = AudioClock(output_ring, channels)
         threading.Thread(target=play_audio, daemon=True).start()
         threading.Thread(target=process_video, daemon=True).start()
         start_button.config(text="Stop", command=stop_processing)
@@ -213,47 +266,110 @@ def stop_processing():
     start_button.config(text="Start", command=start_processing)
 
 def update_key(new_key):
-    global current_key
-    current_key = new_key
+    params.update(key=new_key)
 
 def update_scale(new_scale):
-    global current_scale
-    current_scale = new_scale
+    params.update(scale=new_scale)
 
-def update_duration(new_duration):
-    global note_duration
-    note_duration = float(new_duration)
-
-
-# Create main window
-root = tk.Tk()
-root.title("Video to Audio Converter")
-
-# Create and pack widgets
-frame = ttk.Frame(root, padding="10")
-frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-
-ttk.Button(frame, text="Select Video", command=select_video_source).grid(column=0, row=0, padx=5, pady=5)
-ttk.Button(frame, text="Use Webcam", command=use_webcam).grid(column=1, row=0, padx=5, pady=5)
-
-ttk.Label(frame, text="Key:").grid(column=0, row=1, padx=5, pady=5)
-key_var = tk.StringVar(value="C")
-ttk.Combobox(frame, textvariable=key_var, values=list(NOTES.keys()), state="readonly", width=5).grid(column=1, row=1, padx=5, pady=5)
-key_var.trace("w", lambda *args: update_key(key_var.get()))
+def update_tiles(new_tiles):
+    global tile_grid
+    tile_grid = TILE_GRIDS[new_tiles]
 
-ttk.Label(frame, text="Scale:").grid(column=2, row=1, padx=5, pady=5)
-scale_var = tk.StringVar(value="major")
-ttk.Combobox(frame, textvariable=scale_var, values=list(SCALES.keys()), state="readonly", width=15).grid(column=3, row=1, padx=5, pady=5)
-scale_var.trace("w", lambda *args: update_scale(scale_var.get()))
+def update_show_metrics(show):
+    global show_metrics
+    show_metrics = show
 
-ttk.Label(frame, text="Note Duration:").grid(column=0, row=2, padx=5, pady=5)
-duration_var = tk.StringVar(value="0.1")
-ttk.Entry(frame, textvariable=duration_var, width=5).grid(column=1, row=2, padx=5, pady=5)
-duration_var.trace("w", lambda *args: update_duration(duration_var.get()))
+def update_event_mode(enabled):
+    global event_mode
+    event_mode = enabled  # Takes effect on the next Start
 
-start_button = ttk.Button(frame, text="Start", command=start_processing, state=tk.DISABLED)
-start_button.grid(column=0, row=3, columnspan=2, padx=5, pady=5)
-
-root.mainloop()
-
-#python VideoToAudio5.py
\ No newline at end of file
+def update_duration(new_duration):
+    try:
+        params.update(note_duration=float(new_duration))
+    except ValueError:
+        pass  # Half-typed entry such as "" or "0."; keep the last valid duration
+
+def run_gui():
+    global start_button
+    # tkinter is only loaded by the GUI, so the engine imports cleanly in headless workers
+    import tkinter as tk
+    from tkinter import ttk
+
+    # Create main window
+    root = tk.Tk()
+    root.title("Video to Audio Converter")
+
+    # Create and pack widgets
+    frame = ttk.Frame(root, padding="10")
+    frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+    ttk.Button(frame, text="Select Video", command=select_video_source).grid(column=0, row=0, padx=5, pady=5)
+    ttk.Button(frame, text="Use Webcam", command=use_webcam).grid(column=1, row=0, padx=5, pady=5)
+
+    ttk.Label(frame, text="Key:").grid(column=0, row=1, padx=5, pady=5)
+    key_var = tk.StringVar(value="C")
+    ttk.Combobox(frame, textvariable=key_var, values=list(NOTES.keys()), state="readonly", width=5).grid(column=1, row=1, padx=5, pady=5)
+    key_var.trace("w", lambda *args: update_key(key_var.get()))
+
+    ttk.Label(frame, text="Scale:").grid(column=2, row=1, padx=5, pady=5)
+    scale_var = tk.StringVar(value="major")
+    ttk.Combobox(frame, textvariable=scale_var, values=list(SCALES.keys()), state="readonly", width=15).grid(column=3, row=1, padx=5, pady=5)
+    scale_var.trace("w", lambda *args: update_scale(scale_var.get()))
+
+    ttk.Label(frame, text="Note Duration:").grid(column=0, row=2, padx=5, pady=5)
+    duration_var = tk.StringVar(value="0.1")
+    ttk.Entry(frame, textvariable=duration_var, width=5).grid(column=1, row=2, padx=5, pady=5)
+    duration_var.trace("w", lambda *args: update_duration(duration_var.get()))
+
+    ttk.Label(frame, text="Tiles:").grid(column=2, row=2, padx=5, pady=5)
+    tiles_var = tk.StringVar(value="off")
+    ttk.Combobox(frame, textvariable=tiles_var, values=list(TILE_GRIDS.keys()), state="readonly", width=5).grid(column=3, row=2, padx=5, pady=5)
+    tiles_var.trace("w", lambda *args: update_tiles(tiles_var.get()))
+
+    metrics_var = tk.BooleanVar(value=show_metrics)
+    ttk.Checkbutton(frame, text="Show timings", variable=metrics_var, command=lambda: update_show_metrics(metrics_var.get())).grid(column=2, row=3, columnspan=2, padx=5, pady=5)
+
+    events_var = tk.BooleanVar(value=event_mode)
+    ttk.Checkbutton(frame, text="Only sound changes", variable=events_var, command=lambda: update_event_mode(events_var.get())).grid(column=2, row=4, columnspan=2, padx=5, pady=5)
+
+    start_button = ttk.Button(frame, text="Start", command=start_processing, state=tk.DISABLED)
+    start_button.grid(column=0, row=3, columnspan=2, padx=5, pady=5)
+
+    root.mainloop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Video to Audio Converter")
+    parser.add_argument("--render", nargs=2, metavar=("VIDEO", "OUTPUT"), help="Render a video to a WAV/FLAC file without the GUI")
+    parser.add_argument("--play", metavar="VIDEO", help="Send a video's audio to --sink without the GUI")
+    parser.add_argument("--sessions", nargs="+", metavar="SOURCE", help="Run many videos or camera indices at once without the GUI")
+    parser.add_argument("--workers", type=int, help="Shared analysis/synthesis threads for --sessions (default: one per CPU)")
+    parser.add_argument("--output_dir", help="Record each of the --sessions to its own WAV file in this directory")
+    parser.add_argument("--sink", default="pyaudio", choices=SINK_CHOICES, help="Output used by --play and --sessions")
+    parser.add_argument("--port", type=int, help="scsynth UDP port for the osc sink")
+    parser.add_argument("--key", default=params.snapshot().key, choices=list(NOTES.keys()), help="Key used by --render, --play and --sessions")
+    parser.add_argument("--scale", default=params.snapshot().scale, choices=list(SCALES.keys()), help="Scale used by --render, --play and --sessions")
+    parser.add_argument("--note_duration", type=float, default=params.snapshot().note_duration, help="Seconds per note used by --render, --play and --sessions")
+    parser.add_argument("--processes", type=int, help="Decode and analyse --render/--play in this many worker processes")
+    parser.add_argument("--tiles", default="off", choices=list(TILE_GRIDS.keys()), help="Give each tile its own voice (stereo output)")
+    parser.add_argument("--metrics", metavar="PATH", help="Append live pipeline timings to a .csv or .jsonl file")
+    parser.add_argument("--show_metrics", action="store_true", help="Draw live timing percentiles on the video")
+    parser.add_argument("--events", action="store_true", help="Only start notes on motion or colour changes (GUI and --sessions)")
+    args = parser.parse_args()
+
+    if args.render:
+        render_video_to_file(args.render[0], args.render[1], args.key, args.scale, args.note_duration, TILE_GRIDS[args.tiles], args.processes)
+    elif args.play:
+        play_video_to_sink(args.play, args.sink, args.key, args.scale, args.note_duration, TILE_GRIDS[args.tiles], args.port, args.processes)
+    elif args.sessions:
+        run_sessions(args.sessions, args.sink, args.key, args.scale, args.note_duration, TILE_GRIDS[args.tiles],
+                     args.workers, args.output_dir, args.metrics, args.port, args.events)
+    else:
+        metrics_path = args.metrics
+        show_metrics = args.show_metrics
+        event_mode = args.events
+        run_gui()
+
+#python VideoToAudio5.py
+#python VideoToAudio5.py --render input.mp4 output.wav
+#python VideoToAudio5.py --play input.mp4 --sink osc
+#python VideoToAudio5.py --sessions 0 1 2 cam3.mp4 --output_dir recordings --workers 8
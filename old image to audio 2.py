@@ -1,6 +1,5 @@
 import cv2
 import numpy as np
-import simpleaudio as sa
 import time
 
 def get_average_color(image_path):
@@ -56,6 +55,7 @@ def generate_melody(root_freq, scale, duration=1, sample_rate=44100):
     return np.int16(melody / np.max(np.abs(melody)) * 32767)
 
 def play_color_chord(image_path):
+    import simpleaudio as sa  # Only playback needs an audio device
     start_time = time.time()
     
     # Get average color
@@ -105,6 +105,7 @@ def play_color_chord(image_path):
     print(f"Total execution time: {end_time - start_time:.3f} seconds")
 
 # Main execution
-image_path = r"C:\Users\DB\Desktop\FunSideProjects\dog.jpeg"
-#image_path = r"C:\Users\DB\Desktop\FunSideProjects\dog2.jpg"
-play_color_chord(image_path) 
\ No newline at end of file
+if __name__ == "__main__":
+    image_path = r"C:\Users\DB\Desktop\FunSideProjects\dog.jpeg"
+    #image_path = r"C:\Users\DB\Desktop\FunSideProjects\dog2.jpg"
+    play_color_chord(image_path)
\ No newline at end of file
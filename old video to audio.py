@@ -1,16 +1,85 @@
 import cv2
 import numpy as np
-import simpleaudio as sa
+import pyaudio
 import time
 import threading
 
-# Function to play audio in a separate thread
-def play_audio(audio_data):
-    try:
-        play_obj = sa.play_buffer(audio_data, 1, 2, 44100)
-        play_obj.wait_done()
-    except Exception as e:
-        print("Error playing audio:", e)
+SAMPLE_RATE = 44100
+BLOCK_SIZE = 1024
+NOTE_DURATION = 0.3  # Duration of each note in seconds
+MAX_VOICES = 8  # Polyphony limit; the oldest note is stolen beyond this
+NOTE_GAIN = 0.25  # Headroom so overlapping notes don't clip
+
+NOTE_SAMPLES = int(SAMPLE_RATE * NOTE_DURATION)
+NOTE_TIME = np.arange(NOTE_SAMPLES) / SAMPLE_RATE
+
+class Mixer:
+    # One thread sums every active note into a single output stream, so the thread
+    # and audio handle count stays the same however long the video runs
+    def __init__(self, max_voices=MAX_VOICES, max_samples=NOTE_SAMPLES):
+        self.max_voices = max_voices
+        # Note buffers are recycled: one per voice plus one being filled by the video thread
+        self.free_buffers = [np.empty(max_samples, dtype=np.float32) for _ in range(max_voices + 1)]
+        self.voices = []  # [buffer, length, position], oldest first
+        self.lock = threading.Lock()
+        self.running = False
+        self.stolen = 0
+        self.block = np.zeros(BLOCK_SIZE, dtype=np.float32)
+        self.pcm = np.zeros(BLOCK_SIZE, dtype=np.int16)
+
+    def start(self):
+        self.p = pyaudio.PyAudio()
+        self.stream = self.p.open(format=pyaudio.paInt16, channels=1, rate=SAMPLE_RATE,
+                                  output=True, frames_per_buffer=BLOCK_SIZE)
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def play(self, root_freq, duration):
+        with self.lock:
+            buffer = self.free_buffers.pop()
+        length = generate_note(root_freq, duration, out=buffer)
+        with self.lock:
+            if len(self.voices) >= self.max_voices:
+                self.free_buffers.append(self.voices.pop(0)[0])
+                self.stolen += 1
+            self.voices.append([buffer, length, 0])
+
+    def mix(self, block):
+        block.fill(0)
+        with self.lock:
+            for voice in self.voices:
+                buffer, length, position = voice
+                count = min(len(block), length - position)
+                block[:count] += buffer[position:position + count]
+                voice[2] = position + count
+            finished = [voice for voice in self.voices if voice[2] >= voice[1]]
+            for voice in finished:
+                self.voices.remove(voice)
+                self.free_buffers.append(voice[0])
+        block *= NOTE_GAIN
+
+    def run(self):
+        # The blocking write paces this loop to the sound card
+        while self.running:
+            try:
+                self.mix(self.block)
+                np.multiply(np.clip(self.block, -1, 1), 32767, out=self.pcm, casting='unsafe')
+                self.stream.write(self.pcm.tobytes())
+            except Exception as e:
+                print("Error playing audio:", e)
+                break
+
+    def close(self):
+        # Let the last notes ring out before stopping
+        while self.voices and self.thread.is_alive():
+            time.sleep(BLOCK_SIZE / SAMPLE_RATE)
+        self.running = False
+        self.thread.join()
+        self.stream.stop_stream()
+        self.stream.close()
+        self.p.terminate()
+        print(f"Mixer: {self.stolen} notes stolen")
 
 # Function to resize frames for faster processing
 def resize_frame(frame, max_size=500):
@@ -34,17 +103,18 @@ def generate_waveform(t, frequency, waveform_type):
     else:  # triangle
         return 2 * np.abs(2 * (frequency * t - np.floor(0.5 + frequency * t))) - 1
 
-def generate_note(root_freq, duration, sample_rate=44100):
-    t = np.linspace(0, duration, int(sample_rate * duration), False)
-    note = np.sin(2 * np.pi * root_freq * t)
-    note = np.int16(note / np.max(np.abs(note)) * 32767)
-    return note
+def generate_note(root_freq, duration, out):
+    # Fills a pooled buffer in place and returns how many samples it used
+    length = min(int(SAMPLE_RATE * duration), len(out))
+    note = out[:length]
+    np.multiply(NOTE_TIME[:length], 2 * np.pi * root_freq, out=note, casting='unsafe')
+    np.sin(note, out=note)
+    return length
 
 def process_video(video_path):
     cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-
-    note_duration = 0.3  # Duration of each note in seconds
+    mixer = Mixer()
+    mixer.start()
 
     while True:
         try:
@@ -66,21 +136,12 @@ def process_video(video_path):
             if avg_color < 50:
                 # Generate a random note between C4 and B4
                 root_freq = 261.63 * (2 ** ((np.random.randint(0, 12) - 3) / 12))
-                new_audio = generate_note(root_freq, note_duration)
-
-                # Create and start a thread for audio playback
-                audio_thread = threading.Thread(target=play_audio, args=(new_audio,))
-                audio_thread.start()
+                mixer.play(root_freq, NOTE_DURATION)
 
             # Determine root note (based on blue value)
             root_freq = 220 + (b / 255) * 440
 
-            # Generate audio data
-            new_audio = generate_note(root_freq, note_duration)
-
-            # Create and start a thread for audio playback
-            audio_thread = threading.Thread(target=play_audio, args=(new_audio,))
-            audio_thread.start()
+            mixer.play(root_freq, NOTE_DURATION)
 
             # Display the frame
             cv2.imshow('Video', frame)
@@ -92,5 +153,6 @@ def process_video(video_path):
 
     cap.release()
     cv2.destroyAllWindows()
+    mixer.close()
 # Main execution
 process_video(r"C:\Users\DB\Desktop\FunSideProjects\ShibuyaWalk.mp4")
\ No newline at end of file
@@ -0,0 +1,14 @@
+# Analysis and synthesis engine behind VideoToAudio5.py. Importing it never opens a window or an
+# audio device: pyaudio, tkinter and the OSC client are only loaded by the outputs that use them.
+from .music import NOTES, SCALES, CHORD_TYPES, CHORD_NAMES, get_notes_in_key
+from .synth import (CHUNK_SIZE, SAMPLE_RATE, WAVEFORMS, generate_note, generate_chord,
+                    SynthVoice, VoiceBank, ChordCache, make_synth)
+from .analysis import (DEFAULT_NOTE_DURATION, TILE_GRIDS, ANALYSIS_DTYPE, open_capture, resize_frame,
+                       get_average_color, color_to_chord, analyze_frame, analyze_tiles, draw_overlay,
+                       EventDetector, apply_event, analyze_batches, analyze_video)
+from .output import (SINK_CHOICES, RingBuffer, WavWriter, open_audio_writer, NullSink, FileSink,
+                     PyAudioSink, ThreadedPyAudioSink, OscSink, make_sink)
+from .params import Params, ParameterStore
+from .sharedframes import SharedFrameRing, SharedFrameAnalyzer
+from .render import drive_synth, sonify_video, render_video_to_file, play_video_to_sink
+from .session import Session, SessionManager, run_sessions
@@ -0,0 +1,234 @@
+import functools
+import time
+
+import cv2
+import numpy as np
+
+from .music import NOTES, CHORD_NAMES, get_notes_in_key
+from .synth import WAVEFORMS
+
+DEFAULT_NOTE_DURATION = 0.1  # Seconds per note
+ANALYSIS_BATCH_SIZE = 64  # Frames reduced together in offline analysis
+CAMERA_CAPTURE_SIZE = (640, 480)  # Analysis never needs more than this from a camera
+TILE_GRIDS = {'off': None, '2x2': (2, 2), '4x4': (4, 4), '8x8': (8, 8)}
+MOTION_SCALE = 8  # Event mode compares greyscale copies of the analysis frame shrunk this many times
+MOTION_PIXEL_THRESHOLD = 24  # Brightness change that marks a thumbnail pixel as moving, above compression noise
+MOTION_THRESHOLD = 0.01  # Fraction of moving pixels that counts as movement
+MOTION_FULL_SCALE = 0.2  # Motion at which notes are loudest and densest
+COLOR_THRESHOLD = 16  # Change in any average RGB channel that starts a note without movement
+MIN_VELOCITY = 0.3
+MAX_NOTE_GAP = 4  # Notes at threshold motion are this many note durations apart, at full scale one
+
+def resize_frame(frame, max_size=500):
+    height, width = frame.shape[:2]
+    scale = max_size / max(height, width)
+    return cv2.resize(frame, (int(width * scale), int(height * scale)))
+
+def get_average_color(frame):
+    return cv2.mean(frame)[:3][::-1]  # Convert BGR to RGB
+
+def open_capture(source):
+    cap = cv2.VideoCapture(source)
+    if not isinstance(source, str):
+        # Cameras can deliver a small mode directly instead of full frames we'd only shrink again
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_CAPTURE_SIZE[0])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_CAPTURE_SIZE[1])
+    return cap
+
+def frame_stride(fps, duration):
+    # Frames closer together than one note can't change what is heard
+    return max(1, int(round(duration * fps)))
+
+def frame_time(cap, position, frame_duration):
+    # Presentation timestamp of the frame just grabbed, counted from the frame rate if the backend has none
+    pts = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+    return pts if pts > 0 or position == 0 else position * frame_duration
+
+def skip_frames(cap, count):
+    # grab() advances without the colour conversion and copy of retrieve()
+    skipped = 0
+    while skipped < count and cap.grab():
+        skipped += 1
+    return skipped
+
+@functools.lru_cache(maxsize=None)
+def get_color_tables(num_key_notes):
+    # Index lookup for every possible 8-bit hue, saturation and value, built once per scale length
+    levels = np.arange(256)
+    note_by_hue = np.minimum((levels / 180 * num_key_notes).astype(int), num_key_notes - 1)
+    chord_by_sat = np.minimum((levels / 255 * len(CHORD_NAMES)).astype(int), len(CHORD_NAMES) - 1)
+    waveform_by_val = np.minimum((levels / 255 * len(WAVEFORMS)).astype(int), len(WAVEFORMS) - 1)
+    return note_by_hue, chord_by_sat, waveform_by_val
+
+def color_to_chord(r, g, b, key_notes):
+    h, s, v = cv2.cvtColor(np.uint8([[[b, g, r]]]), cv2.COLOR_RGB2HSV)[0][0]
+    note_by_hue, chord_by_sat, waveform_by_val = get_color_tables(len(key_notes))
+    base_note = key_notes[note_by_hue[h]]
+    base_freq = NOTES[base_note]
+    chord_type = CHORD_NAMES[chord_by_sat[s]]
+    waveform = WAVEFORMS[waveform_by_val[v]]
+    return base_freq, chord_type, waveform, base_note
+
+def analyze_frame(frame, key_notes, metrics=None):
+    start = time.perf_counter()
+    frame = resize_frame(frame)
+    resized = time.perf_counter()
+    r, g, b = get_average_color(frame)
+    averaged = time.perf_counter()
+    chord = color_to_chord(r, g, b, key_notes)
+    if metrics is not None:
+        metrics.record('resize', resized - start)
+        metrics.record('average_color', averaged - resized)
+        metrics.record('color_to_chord', time.perf_counter() - averaged)
+    return frame, (r, g, b), chord
+
+def draw_overlay(frame, rgb, chord, metric_lines=()):
+    r, g, b = rgb
+    base_freq, chord_type, waveform, base_note = chord
+    cv2.putText(frame, f"Chord: {base_note} {chord_type}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    cv2.putText(frame, f"RGB: ({int(r)}, {int(g)}, {int(b)})", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    cv2.putText(frame, f"Waveform: {waveform}", (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    # p50 / p95 / p99 per step
+    for row, line in enumerate(metric_lines):
+        cv2.putText(frame, line, (10, 115 + row * 18), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
+    return frame
+
+def analyze_tiles(frame, grid, num_key_notes):
+    # INTER_AREA down to one pixel per tile averages every tile in a single call
+    rows, cols = grid
+    tiles = cv2.resize(frame, (cols, rows), interpolation=cv2.INTER_AREA)
+    return colors_to_chord_indices(tiles.reshape(-1, 3), num_key_notes)
+
+def retune_tiles(tiles, num_key_notes):
+    # Re-map tiles analysed under a different key/scale; only the note depends on it
+    tiles = tiles.copy()
+    tiles['note'] = get_color_tables(num_key_notes)[0][tiles['hue']]
+    return tiles
+
+def set_tile_voices(bank, tiles, key_freqs, grid, velocities=None):
+    rows, cols = grid
+    gains = np.ones(rows * cols) if velocities is None else velocities
+    pans = np.tile(np.linspace(-1, 1, cols) if cols > 1 else np.zeros(1), rows)
+    bank.set_voices(key_freqs[tiles['note']], tiles['chord'], tiles['waveform'], gains, pans)
+
+class EventDetector:
+    # Event mode: notes only start when the picture changes. Motion is the fraction of pixels that
+    # differ between small greyscale copies of consecutive frames; more motion means louder, denser notes
+    def __init__(self, motion_threshold=MOTION_THRESHOLD, color_threshold=COLOR_THRESHOLD):
+        self.motion_threshold = motion_threshold
+        self.color_threshold = color_threshold
+        self.previous = None
+        self.moving = None
+        self.motion = 0.0
+        self.note_rgb = None
+        self.note_time = None
+        self.notes = 0
+
+    def measure(self, frame):
+        # A whole-number shrink lets INTER_AREA take its fast block-averaging path
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        height, width = gray.shape[0] // MOTION_SCALE, gray.shape[1] // MOTION_SCALE
+        small = cv2.resize(gray[:height * MOTION_SCALE, :width * MOTION_SCALE], (width, height), interpolation=cv2.INTER_AREA)
+        if self.previous is not None:
+            difference = cv2.absdiff(small, self.previous)
+            self.moving = cv2.threshold(difference, MOTION_PIXEL_THRESHOLD, 255, cv2.THRESH_BINARY)[1]
+            self.motion = cv2.countNonZero(self.moving) / self.moving.size
+        self.previous = small
+        return self.motion
+
+    def velocity(self, level):
+        return MIN_VELOCITY + (1 - MIN_VELOCITY) * np.minimum(level / MOTION_FULL_SCALE, 1)
+
+    def update(self, frame, rgb, now, note_duration):
+        # frame is the downscaled analysis frame; returns the velocity of a note to start now, or None
+        motion = self.measure(frame)
+        color_change = self.note_rgb is None or max(abs(a - b) for a, b in zip(rgb, self.note_rgb)) >= self.color_threshold
+        if motion < self.motion_threshold and not color_change:
+            return None
+        gap = note_duration * MAX_NOTE_GAP ** (1 - min(motion / MOTION_FULL_SCALE, 1))
+        if self.note_time is not None and now - self.note_time < gap:
+            return None
+        self.note_rgb = rgb
+        self.note_time = now
+        self.notes += 1
+        return float(self.velocity(motion))
+
+    def note_over(self, now, note_duration):
+        return self.note_time is not None and now - self.note_time >= note_duration
+
+    def tile_velocities(self, grid):
+        # Per-tile velocities from the last frame's moving pixels; still tiles are silent
+        rows, cols = grid
+        if self.moving is None:
+            return np.zeros(rows * cols)
+        levels = cv2.resize(self.moving, (cols, rows), interpolation=cv2.INTER_AREA).ravel() / 255
+        return np.where(levels >= self.motion_threshold, self.velocity(levels), 0.0)
+
+def apply_event(synth, detector, frame, rgb, chord, tiles, key_freqs, grid, now, note_duration):
+    # Event-mode counterpart of setting the synth from every frame; returns True if a note started
+    velocity = detector.update(frame, rgb, now, note_duration)
+    if tiles is not None:
+        set_tile_voices(synth, tiles, key_freqs, grid, detector.tile_velocities(grid))
+    elif velocity is not None:
+        base_freq, chord_type, waveform, base_note = chord
+        synth.set_chord(base_freq, chord_type, waveform, velocity)
+    elif detector.note_over(now, note_duration):
+        synth.release()
+    return velocity is not None
+
+# Offline analysis works on stacks of frames and returns one compact record per frame
+ANALYSIS_DTYPE = np.dtype([('hue', np.uint8), ('sat', np.uint8), ('val', np.uint8),
+                           ('note', np.uint8), ('chord', np.uint8), ('waveform', np.uint8),
+                           ('frames', np.uint16)])
+
+def colors_to_chord_indices(mean_bgr, num_key_notes):
+    # Same mapping as color_to_chord, for a whole (N, 3) array of frame means in one pass
+    pixels = mean_bgr.astype(np.uint8).reshape(-1, 1, 3)
+    hsv = cv2.cvtColor(pixels, cv2.COLOR_RGB2HSV).reshape(-1, 3)
+    h, s, v = hsv[:, 0], hsv[:, 1], hsv[:, 2]
+    analysis = np.empty(len(hsv), dtype=ANALYSIS_DTYPE)
+    analysis['hue'], analysis['sat'], analysis['val'] = h, s, v
+    note_by_hue, chord_by_sat, waveform_by_val = get_color_tables(num_key_notes)
+    analysis['note'] = note_by_hue[h]
+    analysis['chord'] = chord_by_sat[s]
+    analysis['waveform'] = waveform_by_val[v]
+    analysis['frames'] = 1
+    return analysis
+
+def read_color_batches(cap, stride=1, batch_size=ANALYSIS_BATCH_SIZE):
+    # Frames are reduced to their mean as they are decoded (cv2.mean is faster than
+    # any numpy reduction over a stack), only the (N, 3) means are batched.
+    # Each analysed frame is followed by stride - 1 grabbed ones; spans counts both.
+    means = np.empty((batch_size, 3))
+    spans = np.empty(batch_size, dtype=np.uint16)
+    count = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        means[count] = cv2.mean(resize_frame(frame))[:3]
+        spans[count] = 1 + skip_frames(cap, stride - 1)
+        count += 1
+        if count == batch_size:
+            yield means, spans
+            count = 0
+    if count:
+        yield means[:count], spans[:count]
+
+def analyze_batches(cap, fps, num_key_notes, duration):
+    for means, spans in read_color_batches(cap, frame_stride(fps, duration)):
+        analysis = colors_to_chord_indices(means, num_key_notes)
+        analysis['frames'] = spans
+        yield analysis
+
+def analyze_video(video_path, key='C', scale='major', duration=DEFAULT_NOTE_DURATION):
+    cap = open_capture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video file: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    num_key_notes = len(get_notes_in_key(key, scale))
+    try:
+        batches = list(analyze_batches(cap, fps if fps > 0 else 30, num_key_notes, duration))
+    finally:
+        cap.release()
+    return np.concatenate(batches) if batches else np.empty(0, dtype=ANALYSIS_DTYPE)
@@ -0,0 +1,40 @@
+# Define notes and their frequencies
+NOTES = {
+    'C': 261.63, 'C#': 277.18, 'D': 293.66, 'D#': 311.13, 'E': 329.63, 'F': 349.23,
+    'F#': 369.99, 'G': 392.00, 'G#': 415.30, 'A': 440.00, 'A#': 466.16, 'B': 493.88
+}
+
+# Define scales (patterns of whole and half steps)
+SCALES = {
+    'major': [0, 2, 4, 5, 7, 9, 11],
+    'natural_minor': [0, 2, 3, 5, 7, 8, 10],
+    'harmonic_minor': [0, 2, 3, 5, 7, 8, 11],
+    'melodic_minor': [0, 2, 3, 5, 7, 9, 11],
+    'dorian': [0, 2, 3, 5, 7, 9, 10],
+    'phrygian': [0, 1, 3, 5, 7, 8, 10],
+    'lydian': [0, 2, 4, 6, 7, 9, 11],
+    'mixolydian': [0, 2, 4, 5, 7, 9, 10],
+    'locrian': [0, 1, 3, 5, 6, 8, 10],
+    'pentatonic_major': [0, 2, 4, 7, 9],
+    'pentatonic_minor': [0, 3, 5, 7, 10],
+    'blues': [0, 3, 5, 6, 7, 10]
+}
+
+# Define common chord types
+CHORD_TYPES = {
+    'major': [0, 4, 7],
+    'minor': [0, 3, 7],
+    'diminished': [0, 3, 6],
+    'augmented': [0, 4, 8],
+    'sus4': [0, 5, 7],
+    'sus2': [0, 2, 7],
+    '7th': [0, 4, 7, 10],
+    'm7': [0, 3, 7, 10],
+    'maj7': [0, 4, 7, 11]
+}
+CHORD_NAMES = list(CHORD_TYPES.keys())
+
+def get_notes_in_key(key, scale_type='major'):
+    start_index = list(NOTES.keys()).index(key)
+    scale_pattern = SCALES[scale_type]
+    return [list(NOTES.keys())[(start_index + interval) % 12] for interval in scale_pattern]
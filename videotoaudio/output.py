@@ -0,0 +1,312 @@
+import threading
+import time
+import wave
+
+import numpy as np
+
+from .music import CHORD_TYPES
+from .synth import CHUNK_SIZE, SAMPLE_RATE, make_synth
+
+OUTPUT_LATENCY_BLOCKS = 2  # Blocks queued ahead of the sound card
+FILE_SINK_BATCH_BLOCKS = 64  # Blocks gathered before each write call
+SINK_CHOICES = ['pyaudio', 'osc', 'null']
+
+class RingBuffer:
+    # Single producer / single consumer: each side only ever advances its own index, so no lock is needed
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=np.float32)
+        self.read_index = 0
+        self.write_index = 0
+        self.underruns = 0
+        self.overruns = 0
+        self.consumed = 0  # Samples the device has taken, silence included
+
+    def available(self):
+        return self.write_index - self.read_index
+
+    def free(self):
+        return self.capacity - self.available()
+
+    def write_regions(self, count):
+        # Views of the free space so the producer can render straight into the ring
+        count = min(count, self.free())
+        start = self.write_index % self.capacity
+        first = min(count, self.capacity - start)
+        return self.buffer[start:start + first], self.buffer[:count - first]
+
+    def commit(self, count):
+        self.write_index += count
+
+    def write(self, samples):
+        first, second = self.write_regions(len(samples))
+        written = len(first) + len(second)
+        if written < len(samples):
+            self.overruns += 1
+        first[:] = samples[:len(first)]
+        second[:] = samples[len(first):written]
+        self.commit(written)
+        return written
+
+    def read_into(self, out):
+        count = min(len(out), self.available())
+        start = self.read_index % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self.buffer[start:start + first]
+        out[first:count] = self.buffer[:count - first]
+        if count < len(out):
+            out[count:] = 0
+            self.underruns += 1
+        self.read_index += count
+        self.consumed += len(out)
+        return count
+
+def open_output_stream(ring, channels, metrics=None):
+    # The callback only copies out of the ring; whoever fills the ring does the rendering
+    import pyaudio  # Only the live outputs need an audio device
+    output = np.zeros(CHUNK_SIZE * channels, dtype=np.float32)
+
+    def callback(in_data, frame_count, time_info, status):
+        start = time.perf_counter()
+        block = output[:frame_count * channels]
+        ring.read_into(block)
+        data = block.tobytes()
+        if metrics is not None:
+            metrics.record('output', time.perf_counter() - start)
+        return data, pyaudio.paContinue
+
+    p = pyaudio.PyAudio()
+    stream = p.open(format=pyaudio.paFloat32,
+                    channels=channels,
+                    rate=SAMPLE_RATE,
+                    output=True,
+                    frames_per_buffer=CHUNK_SIZE,
+                    stream_callback=callback)
+    stream.start_stream()
+    return p, stream
+
+class WavWriter:
+    # Streams 16-bit PCM to disk so long renders never sit in memory
+    def __init__(self, path, channels=1):
+        self.wav = wave.open(path, 'wb')
+        self.wav.setnchannels(channels)
+        self.wav.setsampwidth(2)
+        self.wav.setframerate(SAMPLE_RATE)
+        self.pcm = np.empty(CHUNK_SIZE * channels, dtype=np.int16)
+
+    def write(self, samples):
+        if samples.size > self.pcm.size:
+            self.pcm = np.empty(samples.size, dtype=np.int16)
+        pcm = self.pcm[:samples.size]
+        np.multiply(np.clip(samples.ravel(), -1, 1), 32767, out=pcm, casting='unsafe')
+        self.wav.writeframes(pcm)
+
+    def close(self):
+        self.wav.close()
+
+def open_audio_writer(path, channels=1):
+    if path.lower().endswith('.wav'):
+        return WavWriter(path, channels)
+    import soundfile  # Only needed for FLAC and other formats
+    return soundfile.SoundFile(path, 'w', samplerate=SAMPLE_RATE, channels=channels)
+
+class SynthSink:
+    # Base for sinks that synthesise locally. The engine configures self.synth, then advance()
+    # renders up to that point of the video timeline; subclasses only decide where blocks go
+    def __init__(self, synth):
+        self.synth = synth
+        self.channels = synth.channels
+        self.rendered = 0
+        self.closed = False
+
+    def shape(self, samples):
+        return (samples, self.channels) if self.channels > 1 else (samples,)
+
+    def render(self, samples):
+        self.synth.render(self.acquire(samples))
+        self.commit(samples)
+        self.rendered += samples
+
+    def advance(self, seconds):
+        # Chord changes land on block boundaries, the same as live playback
+        target = round(seconds * SAMPLE_RATE)
+        while self.rendered + CHUNK_SIZE <= target:
+            self.render(CHUNK_SIZE)
+
+    def close(self, seconds):
+        if self.closed:
+            return
+        self.closed = True
+        self.advance(seconds)
+        tail = round(seconds * SAMPLE_RATE) - self.rendered
+        if tail > 0:
+            self.render(tail)
+        self.finish()
+
+    def seconds(self):
+        return self.rendered / SAMPLE_RATE
+
+class NullSink(SynthSink):
+    # Renders into one scratch block and throws it away: measures analysis plus synthesis alone
+    def __init__(self, synth):
+        super().__init__(synth)
+        self.block = np.empty(self.shape(CHUNK_SIZE))
+
+    def acquire(self, samples):
+        return self.block[:samples]
+
+    def commit(self, samples):
+        pass
+
+    def finish(self):
+        pass
+
+class FileSink(SynthSink):
+    # Renders straight into a large batch buffer so the encoder sees a few big writes
+    def __init__(self, path, synth, batch_blocks=FILE_SINK_BATCH_BLOCKS):
+        super().__init__(synth)
+        self.writer = open_audio_writer(path, self.channels)
+        self.batch = np.empty(self.shape(CHUNK_SIZE * batch_blocks))
+        self.filled = 0
+
+    def acquire(self, samples):
+        return self.batch[self.filled:self.filled + samples]
+
+    def commit(self, samples):
+        self.filled += samples
+        if self.filled + CHUNK_SIZE > len(self.batch):
+            self.flush()
+
+    def flush(self):
+        if self.filled:
+            self.writer.write(self.batch[:self.filled])
+            self.filled = 0
+
+    def finish(self):
+        try:
+            self.flush()
+        finally:
+            self.writer.close()
+
+class PyAudioSink(SynthSink):
+    # Renders into the output ring and waits for room, so the device clock paces the engine
+    def __init__(self, synth, latency_blocks=OUTPUT_LATENCY_BLOCKS):
+        super().__init__(synth)
+        self.block_samples = CHUNK_SIZE * self.channels
+        self.ring = RingBuffer(self.block_samples * latency_blocks)
+        self.p, self.stream = open_output_stream(self.ring, self.channels)
+
+    def acquire(self, samples):
+        # Writes start on block boundaries until the final tail, so regions never wrap
+        while True:
+            region, _ = self.ring.write_regions(samples * self.channels)
+            if len(region) == samples * self.channels:
+                return region.reshape(self.shape(samples))
+            time.sleep(CHUNK_SIZE / SAMPLE_RATE / 2)
+
+    def commit(self, samples):
+        self.ring.commit(samples * self.channels)
+
+    def finish(self):
+        while self.ring.available() > 0 and self.stream.is_active():
+            time.sleep(CHUNK_SIZE / SAMPLE_RATE)
+        self.stream.stop_stream()
+        self.stream.close()
+        self.p.terminate()
+        print(f"Audio output: {self.ring.underruns} underruns, {self.ring.overruns} overruns")
+
+class ThreadedPyAudioSink(PyAudioSink):
+    # For sinks driven from a shared worker pool: a render thread of its own keeps the ring topped up
+    # like the GUI's play_audio, so advance() never sleeps on the device while holding a worker.
+    # set_chord and set_voices are single assignments, so the pool can change notes mid-render
+    def __init__(self, synth, latency_blocks=OUTPUT_LATENCY_BLOCKS):
+        super().__init__(synth, latency_blocks)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="pyaudio-render", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        block_time = CHUNK_SIZE / SAMPLE_RATE
+        while not self.stop_event.is_set():
+            region, _ = self.ring.write_regions(self.block_samples)
+            if len(region) < self.block_samples:
+                self.stop_event.wait(block_time / 2)
+                continue
+            self.synth.render(region.reshape(self.shape(CHUNK_SIZE)))
+            self.commit(CHUNK_SIZE)
+            self.rendered += CHUNK_SIZE
+
+    def advance(self, seconds):
+        pass  # The device clock is the timeline: new notes sound from the render thread's next block
+
+    def close(self, seconds):
+        if self.closed:
+            return
+        self.closed = True
+        self.stop_event.set()
+        self.thread.join()
+        self.finish()
+
+class OscSink:
+    # scsynth does the synthesis: each chord becomes time-tagged notes, sent one bundle per batch of frames
+    channels = 0
+
+    def __init__(self, port=None, keep_server=False, batch_frames=1):
+        import VideoAudioSuperCollider as sc  # Only this sink needs python-osc and a server
+        sc.setup_supercollider(port=port or sc.SERVER_PORT, keep_server=keep_server)
+        self.sc = sc
+        self.synth = self
+        self.batch_frames = batch_frames
+        self.pending = 0
+        self.chord = None
+        self.position = 0.0
+        self.start_time = time.time() + sc.OSC_LOOKAHEAD
+        self.closed = False
+
+    def set_chord(self, base_freq, chord_type, waveform='sine', velocity=1.0):
+        self.chord = (base_freq, chord_type)  # The server SynthDef has a single waveform and level
+
+    def release(self):
+        pass  # Every chord is already sent as notes that end on their own
+
+    def advance(self, seconds):
+        if self.chord is not None and seconds > self.position:
+            note_time = self.start_time + self.position
+            now = time.time()
+            if note_time < now:
+                # Fell behind: re-anchor rather than send notes that are already late
+                self.start_time = now + self.sc.OSC_LOOKAHEAD - self.position
+                note_time = self.start_time + self.position
+            elif note_time - now > self.sc.OSC_LOOKAHEAD:
+                time.sleep(note_time - now - self.sc.OSC_LOOKAHEAD)  # Stay only the lookahead ahead of the server
+            base_freq, chord_type = self.chord
+            for interval in CHORD_TYPES[chord_type]:
+                self.sc.play_note(base_freq * 2 ** (interval / 12), seconds - self.position, note_time)
+            self.chord = None
+            self.pending += 1
+            if self.pending >= self.batch_frames:
+                self.sc.osc_sender.flush()
+                self.pending = 0
+        self.position = seconds
+
+    def close(self, seconds):
+        if self.closed:
+            return
+        self.closed = True
+        self.advance(seconds)
+        self.sc.osc_sender.flush()
+        time.sleep(max(0, self.start_time + seconds - time.time()))  # Let the last notes sound
+        self.sc.session.report()
+
+    def seconds(self):
+        return self.position
+
+def make_sink(name, grid=None, port=None, render_thread=False):
+    # render_thread gives pyaudio its own render thread instead of pacing whoever calls advance()
+    if name == 'osc':
+        if grid:
+            raise ValueError("Tiled voices need a sample-based sink")
+        return OscSink(port)
+    if name == 'pyaudio':
+        return (ThreadedPyAudioSink if render_thread else PyAudioSink)(make_synth(grid))
+    return NullSink(make_synth(grid))
@@ -0,0 +1,46 @@
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from .music import NOTES, SCALES, get_notes_in_key
+from .analysis import DEFAULT_NOTE_DURATION
+
+# One immutable set of live parameters, with the key/scale tables already worked out
+Params = namedtuple('Params', ['version', 'key', 'scale', 'note_duration', 'key_notes', 'key_freqs'])
+
+class ParameterStore:
+    # Writers swap in a complete new snapshot under the lock; readers call snapshot() once per frame
+    # or block and use only that, so they never mix a key from one change with a scale from another
+    def __init__(self, key='C', scale='major', note_duration=DEFAULT_NOTE_DURATION):
+        self.lock = threading.Lock()
+        self.current = None
+        self.update(key, scale, note_duration)
+
+    def snapshot(self):
+        return self.current
+
+    def update(self, key=None, scale=None, note_duration=None):
+        with self.lock:
+            previous = self.current
+            if previous is not None:
+                key = previous.key if key is None else key
+                scale = previous.scale if scale is None else scale
+                note_duration = previous.note_duration if note_duration is None else note_duration
+            if key not in NOTES:
+                raise ValueError(f"Unknown key: {key}")
+            if scale not in SCALES:
+                raise ValueError(f"Unknown scale: {scale}")
+            if not note_duration > 0:
+                raise ValueError(f"Note duration must be positive: {note_duration}")
+
+            # Tables are only rebuilt when the key or scale actually changes
+            if previous is not None and (key, scale) == (previous.key, previous.scale):
+                key_notes, key_freqs = previous.key_notes, previous.key_freqs
+            else:
+                key_notes = tuple(get_notes_in_key(key, scale))
+                key_freqs = np.array([NOTES[note] for note in key_notes])
+                key_freqs.flags.writeable = False
+            version = previous.version + 1 if previous is not None else 0
+            self.current = Params(version, key, scale, float(note_duration), key_notes, key_freqs)
+            return self.current
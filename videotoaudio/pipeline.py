@@ -0,0 +1,251 @@
+import csv
+import json
+import queue
+import threading
+import time
+
+import numpy as np
+
+from .synth import SAMPLE_RATE
+from .analysis import analyze_frame, analyze_tiles, frame_stride, frame_time, skip_frames
+
+FRAME_BUFFER_SIZE = 5
+ANALYSIS_WORKERS = 2
+DROP_POLICIES = ['block', 'drop_oldest', 'drop_newest']
+DECODE_DROP_POLICY = 'drop_oldest'  # Never let slow analysis stall decoding
+RESULT_DROP_POLICY = 'drop_oldest'  # Never let a slow display stall analysis
+STATS_INTERVAL = 5  # Seconds between pipeline throughput reports
+SYNC_LEAD = 0.1  # Seconds the first frame is scheduled ahead, giving analysis time to catch up
+SYNC_LOOKAHEAD = 0.2  # How far ahead of the audio clock files are decoded
+MAX_LATENESS = 0.1  # Frames later than this are dropped to catch up
+METRICS_WINDOW = 512  # Most recent samples per step used for the rolling percentiles
+METRICS_PERCENTILES = (50, 95, 99)
+METRIC_STEPS = ['decode', 'frame_wait', 'resize', 'average_color', 'color_to_chord', 'result_wait', 'display', 'synth', 'output']
+
+class StageQueue:
+    # Bounded hand-off between pipeline stages; drop_policy says what happens when it is full
+    def __init__(self, maxsize, drop_policy='block'):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.items = queue.Queue(maxsize=maxsize)
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def put(self, item, stop_event):
+        if self.drop_policy == 'block':
+            while not stop_event.is_set():
+                try:
+                    self.items.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            self.items.put_nowait(item)
+            return True
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            if self.drop_policy == 'drop_newest':
+                return False
+        try:
+            self.items.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self.items.put_nowait(item)
+            return True
+        except queue.Full:
+            return False
+
+    def get(self, timeout=0.1):
+        try:
+            return self.items.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def empty(self):
+        return self.items.empty()
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.busy_time = 0.0
+        self.start_time = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def record(self, elapsed):
+        with self.lock:
+            self.count += 1
+            self.busy_time += elapsed
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.start_time, 1e-9)
+        per_frame = self.busy_time / self.count * 1000 if self.count else 0.0
+        return f"{self.name}: {self.count / elapsed:.1f} fps ({per_frame:.1f} ms/frame)"
+
+def report_pipeline(stats, queues, sync=None):
+    stage_reports = ", ".join(stage.report() for stage in stats)
+    dropped = ", ".join(f"{name}: {stage_queue.dropped}" for name, stage_queue in queues.items())
+    print(f"Pipeline {stage_reports} | dropped {dropped}")
+    if sync is not None:
+        print(sync.report())
+
+class AudioClock:
+    # The master clock is the sound card: time only moves as the device consumes samples
+    def __init__(self, ring, channels=1):
+        self.ring = ring
+        self.channels = channels
+
+    def now(self):
+        return self.ring.consumed / self.channels / SAMPLE_RATE
+
+    def write_time(self):
+        # A chord set now is first heard once the queued samples have played
+        return (self.ring.consumed + self.ring.available()) / self.channels / SAMPLE_RATE
+
+class AVSync:
+    # Maps video presentation timestamps onto the audio clock and keeps drift statistics
+    def __init__(self, clock):
+        self.clock = clock
+        self.offset = None
+        self.lock = threading.Lock()
+        self.count = 0
+        self.total_drift = 0.0
+        self.max_drift = 0.0
+        self.decode_dropped = 0
+        self.render_dropped = 0
+
+    def due(self, pts):
+        with self.lock:
+            if self.offset is None:
+                self.offset = self.clock.write_time() + SYNC_LEAD - pts
+        return pts + self.offset
+
+    def lateness(self, pts):
+        return self.clock.write_time() - self.due(pts)
+
+    def wait_until_due(self, pts, lead=0.0, should_wait=lambda: True):
+        while should_wait():
+            early = self.due(pts) - lead - self.clock.write_time()
+            if early <= 0:
+                return
+            time.sleep(min(early, 0.005))
+
+    def record(self, drift):
+        with self.lock:
+            self.count += 1
+            self.total_drift += drift
+            self.max_drift = max(self.max_drift, abs(drift))
+
+    def report(self):
+        mean = self.total_drift / self.count * 1000 if self.count else 0.0
+        return (f"A/V sync: drift {mean:+.1f} ms mean, {self.max_drift * 1000:.1f} ms max | "
+                f"caught up by dropping {self.decode_dropped} decoded, {self.render_dropped} displayed")
+
+class PipelineMetrics:
+    # Keeps the last METRICS_WINDOW timings of each step so percentiles follow the current load
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self.samples = {name: np.zeros(window) for name in METRIC_STEPS}
+        self.counts = dict.fromkeys(METRIC_STEPS, 0)
+        self.lock = threading.Lock()
+
+    def record(self, name, elapsed):
+        with self.lock:
+            self.samples[name][self.counts[name] % self.window] = elapsed
+            self.counts[name] += 1
+
+    def percentiles(self):
+        # Milliseconds per step, or None for steps that haven't run yet
+        with self.lock:
+            recent = {name: self.samples[name][:min(self.counts[name], self.window)].copy() for name in METRIC_STEPS}
+        return {name: np.percentile(values, METRICS_PERCENTILES) * 1000 if len(values) else None
+                for name, values in recent.items()}
+
+    def row(self, counters):
+        row = {'time': round(time.time(), 3)}
+        for name, values in self.percentiles().items():
+            row[f'{name}_count'] = self.counts[name]
+            for percentile, value in zip(METRICS_PERCENTILES, values if values is not None else [None] * len(METRICS_PERCENTILES)):
+                row[f'{name}_p{percentile}_ms'] = None if value is None else round(float(value), 3)
+        row.update(counters)
+        return row
+
+    def overlay_lines(self):
+        return [f"{name}: " + " / ".join(f"{value:.1f}" for value in values) + " ms"
+                for name, values in self.percentiles().items() if values is not None]
+
+class MetricsLog:
+    # Appends one row per report; the extension picks CSV or JSON lines
+    def __init__(self, path):
+        self.file = open(path, 'a', newline='')
+        self.as_csv = path.lower().endswith('.csv')
+        self.writer = None
+
+    def write(self, row):
+        if not self.as_csv:
+            self.file.write(json.dumps(row) + "\n")
+        else:
+            if self.writer is None:
+                self.writer = csv.DictWriter(self.file, fieldnames=list(row))
+                if self.file.tell() == 0:
+                    self.writer.writeheader()
+            self.writer.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def decode_frames(cap, frames, stats, stop_event, frame_duration, get_duration, sync=None, metrics=None):
+    # Files are paced by the audio clock through sync, cameras pace themselves.
+    # get_duration returns the current note length, which can change while playing
+    index = 0
+    position = 0
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        if not cap.grab():
+            break
+        pts = frame_time(cap, position, frame_duration)
+        if sync is not None:
+            # Behind the audio: grab past late frames without decoding them
+            while sync.lateness(pts) > MAX_LATENESS and cap.grab():
+                position += 1
+                sync.decode_dropped += 1
+                pts = frame_time(cap, position, frame_duration)
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
+        if metrics is not None:
+            metrics.record('decode', time.perf_counter() - start)
+        frames.put((index, pts, frame), stop_event)
+        index += 1
+
+        # Only frames that start a new note are retrieved, the rest are just grabbed
+        position += 1 + skip_frames(cap, frame_stride(1 / frame_duration, get_duration()) - 1)
+        stats.record(time.perf_counter() - start)
+
+        if sync is not None:
+            sync.wait_until_due(pts, SYNC_LOOKAHEAD, lambda: not stop_event.is_set())
+
+def analyze_frames(frames, results, stats, stop_event, decode_done, params, grid=None, metrics=None):
+    # Each frame is analysed with one parameter snapshot, which travels with the result
+    while not stop_event.is_set():
+        waited = time.perf_counter()
+        item = frames.get()
+        if item is None:
+            if decode_done.is_set() and frames.empty():
+                break
+            continue
+        index, pts, frame = item
+        start = time.perf_counter()
+        if metrics is not None:
+            metrics.record('frame_wait', start - waited)
+        snapshot = params.snapshot()
+        frame, rgb, chord = analyze_frame(frame, snapshot.key_notes, metrics)
+        tiles = analyze_tiles(frame, grid, len(snapshot.key_notes)) if grid else None
+        stats.record(time.perf_counter() - start)
+        results.put((index, pts, frame, rgb, chord, tiles, snapshot), stop_event)
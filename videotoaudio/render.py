@@ -0,0 +1,88 @@
+import time
+
+import cv2
+import numpy as np
+
+from .music import NOTES, CHORD_NAMES, get_notes_in_key
+from .synth import WAVEFORMS, make_synth
+from .analysis import DEFAULT_NOTE_DURATION, analyze_batches, analyze_tiles, frame_stride, open_capture, resize_frame, set_tile_voices, skip_frames
+from .output import FileSink, make_sink
+from .sharedframes import SharedFrameAnalyzer
+
+def drive_synth(cap, fps, key_notes, duration, synth, grid=None):
+    # Applies each analysed frame to the synth and yields how many source frames it covers
+    if grid is None:
+        for analysis in analyze_batches(cap, fps, len(key_notes), duration):
+            for note, chord, waveform, span in zip(analysis['note'], analysis['chord'], analysis['waveform'], analysis['frames']):
+                synth.set_chord(NOTES[key_notes[note]], CHORD_NAMES[chord], WAVEFORMS[waveform])
+                yield int(span)
+        return
+
+    stride = frame_stride(fps, duration)
+    key_freqs = np.array([NOTES[note] for note in key_notes])
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        set_tile_voices(synth, analyze_tiles(resize_frame(frame), grid, len(key_notes)), key_freqs, grid)
+        yield 1 + skip_frames(cap, stride - 1)
+
+def drive_synth_shared(video_path, fps, key_notes, duration, synth, grid=None, processes=None):
+    # drive_synth with decoding and analysis in other processes; frames never leave shared memory
+    key_freqs = np.array([NOTES[note] for note in key_notes])
+    with SharedFrameAnalyzer(video_path, len(key_notes), frame_stride(fps, duration), grid, processes) as analyzer:
+        for span, analysis in analyzer:
+            if grid is None:
+                note, chord, waveform = analysis['note'][0], analysis['chord'][0], analysis['waveform'][0]
+                synth.set_chord(NOTES[key_notes[note]], CHORD_NAMES[chord], WAVEFORMS[waveform])
+            else:
+                set_tile_voices(synth, analysis, key_freqs, grid)
+            yield span
+
+def sonify_video(video_path, open_sink, key='C', scale='major', duration=DEFAULT_NOTE_DURATION, grid=None, processes=None):
+    # One analysis engine for every output; the sink decides buffering, batching and pacing.
+    # open_sink() is only called once the video has opened, so a bad path leaves no output file behind.
+    # processes moves decoding and analysis out to that many worker processes
+    cap = open_capture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video file: {video_path}")
+    try:
+        sink = open_sink()
+    except Exception:
+        cap.release()
+        raise
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps <= 0:
+        fps = 30
+    key_notes = get_notes_in_key(key, scale)
+    frame_count = 0
+
+    try:
+        if processes:
+            cap.release()  # The capture process opens its own
+            spans = drive_synth_shared(video_path, fps, key_notes, duration, sink.synth, grid, processes)
+        else:
+            spans = drive_synth(cap, fps, key_notes, duration, sink.synth, grid)
+        for span in spans:
+            frame_count += span
+            sink.advance(frame_count / fps)
+    finally:
+        cap.release()
+        sink.close(frame_count / fps)
+    return frame_count, sink.seconds()
+
+def render_video_to_file(video_path, output_path, key='C', scale='major', duration=DEFAULT_NOTE_DURATION, grid=None, processes=None):
+    # Offline render: no display, no audio device and no pacing, so it runs as fast as decoding allows
+    start_time = time.perf_counter()
+    frame_count, audio_seconds = sonify_video(video_path, lambda: FileSink(output_path, make_synth(grid)), key, scale, duration, grid, processes)
+    elapsed = time.perf_counter() - start_time
+    print(f"Rendered {frame_count} frames ({audio_seconds:.1f} s of audio) to {output_path} in {elapsed:.1f} s")
+    return frame_count, audio_seconds
+
+def play_video_to_sink(video_path, sink_name, key='C', scale='major', duration=DEFAULT_NOTE_DURATION, grid=None, port=None, processes=None):
+    start_time = time.perf_counter()
+    frame_count, audio_seconds = sonify_video(video_path, lambda: make_sink(sink_name, grid, port), key, scale, duration, grid, processes)
+    elapsed = time.perf_counter() - start_time
+    print(f"Sent {frame_count} frames ({audio_seconds:.1f} s of audio) to the {sink_name} sink in {elapsed:.1f} s")
+    return frame_count, audio_seconds
@@ -0,0 +1,245 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from .synth import make_synth
+from .analysis import (DEFAULT_NOTE_DURATION, EventDetector, analyze_frame, analyze_tiles, apply_event, frame_stride, frame_time,
+                       open_capture, set_tile_voices, skip_frames)
+from .pipeline import STATS_INTERVAL, StageQueue, StageStats, PipelineMetrics, MetricsLog
+from .output import FileSink, make_sink
+from .params import ParameterStore
+
+SESSION_QUEUE_SIZE = 2  # Frames waiting per source; older ones are dropped so a busy pool never builds up latency
+
+def parse_source(text):
+    # "0", "1", ... are camera indices, anything else is a file or stream URL
+    return int(text) if text.isdigit() else text
+
+def source_name(source):
+    return f"camera{source}" if isinstance(source, int) else os.path.splitext(os.path.basename(source))[0]
+
+class Session:
+    # Everything one source needs: its capture, live parameters, synth voices, output sink and metrics.
+    # Frames are analysed and synthesised on the manager's shared pool, one task per session at a time,
+    # so a session's synth is never touched by two workers at once
+    def __init__(self, name, source, sink, params=None, grid=None, realtime=True, events=False):
+        self.name = name
+        self.source = source
+        self.sink = sink
+        self.params = params or ParameterStore()
+        self.grid = grid
+        self.realtime = realtime  # Play files at their own frame rate, as if they were cameras
+        self.detector = EventDetector() if events else None  # Only sound changes, for mostly still feeds
+        live = realtime or not isinstance(source, str)
+        self.frames = StageQueue(SESSION_QUEUE_SIZE, 'drop_oldest' if live else 'block')
+        self.decode_stats = StageStats("decode")
+        self.analyze_stats = StageStats("analyze")
+        self.metrics = PipelineMetrics()
+        self.stop_event = threading.Event()
+        self.decode_done = threading.Event()
+        self.drained = threading.Event()
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.pool = None
+        self.position = 0.0  # Seconds of the session timeline handed to the sink
+        self.processed = 0
+
+    def start(self, pool):
+        self.pool = pool
+        threading.Thread(target=self.run_decoder, name=f"decode-{self.name}", daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def join(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def run_decoder(self):
+        # Capture keeps its own thread: a camera blocks in grab(), which must never hold a pool worker
+        cap = None
+        try:
+            cap = open_capture(self.source)
+            if not cap.isOpened():
+                raise IOError(f"Cannot open video source: {self.source}")
+            self.decode_frames(cap)
+        except Exception as e:
+            print(f"Error in session {self.name}: {e}")
+        finally:
+            self.decode_done.set()
+            self.schedule()
+            self.drained.wait()
+            if cap is not None:
+                cap.release()
+            try:
+                self.sink.close(self.position + self.params.snapshot().note_duration)
+            except Exception as e:
+                print(f"Error closing session {self.name}: {e}")
+            self.done.set()
+
+    def decode_frames(self, cap):
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_duration = 1 / fps if fps > 0 else 1 / 30
+        is_file = isinstance(self.source, str)
+        started = time.perf_counter()
+        position = 0
+        while not self.stop_event.is_set():
+            start = time.perf_counter()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            self.metrics.record('decode', time.perf_counter() - start)
+            pts = frame_time(cap, position, frame_duration) if is_file else start - started
+            waited = 0.0
+            if is_file and self.realtime:
+                delay = started + pts - time.perf_counter()
+                if delay > 0 and self.stop_event.wait(delay):
+                    break
+                waited = max(delay, 0.0)
+            self.frames.put((pts, frame, time.perf_counter()), self.stop_event)
+            self.schedule()
+
+            # Only frames that start a new note are retrieved, the rest are just grabbed
+            position += 1 + skip_frames(cap, frame_stride(1 / frame_duration, self.params.snapshot().note_duration) - 1)
+            self.decode_stats.record(time.perf_counter() - start - waited)
+
+    def schedule(self):
+        with self.lock:
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self.pool.submit(self.step)
+
+    def step(self):
+        # One frame per pool task, then back of the line, so busy sessions can't starve quiet ones
+        item = None if self.stop_event.is_set() else self.frames.get(timeout=0)
+        if item is not None:
+            try:
+                self.process(*item)
+            except Exception as e:
+                print(f"Error in session {self.name}: {e}")
+                self.stop_event.set()
+        with self.lock:
+            if not self.stop_event.is_set() and not self.frames.empty():
+                self.pool.submit(self.step)
+                return
+            self.scheduled = False
+            if self.decode_done.is_set():
+                self.drained.set()
+
+    def process(self, pts, frame, queued):
+        start = time.perf_counter()
+        self.metrics.record('frame_wait', start - queued)
+        snapshot = self.params.snapshot()
+        frame, rgb, chord = analyze_frame(frame, snapshot.key_notes, self.metrics)
+        tiles = analyze_tiles(frame, self.grid, len(snapshot.key_notes)) if self.grid else None
+        self.analyze_stats.record(time.perf_counter() - start)
+
+        # Audio up to this frame keeps the previous chord, the new one starts here
+        start = time.perf_counter()
+        self.sink.advance(pts)
+        if self.detector is not None:
+            apply_event(self.sink.synth, self.detector, frame, rgb, chord, tiles, snapshot.key_freqs, self.grid, pts, snapshot.note_duration)
+        elif tiles is not None:
+            set_tile_voices(self.sink.synth, tiles, snapshot.key_freqs, self.grid)
+        else:
+            base_freq, chord_type, waveform, base_note = chord
+            self.sink.synth.set_chord(base_freq, chord_type, waveform)
+        self.metrics.record('synth', time.perf_counter() - start)
+        self.position = pts
+        self.processed += 1
+
+    def counters(self):
+        return {
+            'session': self.name,
+            'frames': self.processed,
+            'notes': self.detector.notes if self.detector is not None else self.processed,
+            'dropped': self.frames.dropped,
+            'audio_seconds': round(self.sink.seconds(), 3),
+        }
+
+    def report(self):
+        return (f"Session {self.name}: {self.decode_stats.report()}, {self.analyze_stats.report()} | "
+                f"dropped {self.frames.dropped}, {self.sink.seconds():.1f} s of audio")
+
+class SessionManager:
+    # Runs any number of sessions in one process on a shared worker pool; the pool size, not
+    # global state, bounds how many sources keep up
+    def __init__(self, workers=None, metrics_path=None):
+        self.pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count(), thread_name_prefix="session")
+        self.sessions = {}
+        self.metrics_log = MetricsLog(metrics_path) if metrics_path else None
+        self.closed = False
+
+    def add(self, session):
+        if session.name in self.sessions:
+            raise ValueError(f"Duplicate session name: {session.name}")
+        self.sessions[session.name] = session
+        session.start(self.pool)
+        return session
+
+    def remove(self, name):
+        session = self.sessions.pop(name)
+        session.stop()
+        session.join()
+        return session
+
+    def report(self):
+        for session in list(self.sessions.values()):
+            print(session.report())
+            if self.metrics_log is not None:
+                self.metrics_log.write(session.metrics.row(session.counters()))
+
+    def run(self, report_interval=STATS_INTERVAL):
+        # Blocks until every session has finished; Ctrl+C stops them all
+        last_report = time.perf_counter()
+        try:
+            while not all(session.done.is_set() for session in list(self.sessions.values())):
+                time.sleep(0.1)
+                if time.perf_counter() - last_report >= report_interval:
+                    self.report()
+                    last_report = time.perf_counter()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for session in self.sessions.values():
+            session.stop()
+        for session in self.sessions.values():
+            session.join()
+        self.report()
+        self.pool.shutdown()
+        if self.metrics_log is not None:
+            self.metrics_log.close()
+
+def run_sessions(sources, sink_name='null', key='C', scale='major', duration=DEFAULT_NOTE_DURATION, grid=None,
+                 workers=None, output_dir=None, metrics_path=None, port=None, events=False):
+    # output_dir records every source to its own WAV file instead of sending it to sink_name
+    if sink_name == 'osc' and len(sources) > 1 and not output_dir:
+        raise ValueError("The osc sink drives a single scsynth connection; use one source or another sink")
+    manager = SessionManager(workers, metrics_path)
+    try:
+        for number, text in enumerate(sources):
+            source = parse_source(text)
+            name = source_name(source)
+            if name in manager.sessions:
+                name = f"{name}-{number}"
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+                sink = FileSink(os.path.join(output_dir, name + '.wav'), make_synth(grid))
+            else:
+                sink = make_sink(sink_name, grid, port, render_thread=True)
+            manager.add(Session(name, source, sink, ParameterStore(key, scale, duration), grid, events=events))
+    except Exception:
+        manager.close()
+        raise
+    manager.run()
+    return manager
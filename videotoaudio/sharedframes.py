@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import queue
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from .analysis import analyze_tiles, colors_to_chord_indices, open_capture, resize_frame, skip_frames
+
+FRAME_SLOTS = 8  # Full-size frames in flight between the capture and analysis processes
+ANALYSIS_PROCESSES = max(1, (os.cpu_count() or 2) - 1)  # One core is left for capture and synthesis
+
+class SharedFrameRing:
+    # Fixed BGR frame slots in one shared memory block. Processes only ever exchange slot numbers:
+    # the decoder writes each frame once and the analysers read it in place
+    def __init__(self, shape, slots=FRAME_SLOTS, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=slots * int(np.prod(self.shape)))
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.memory.buf)
+
+    def spec(self):
+        return self.memory.name, self.shape, self.slots
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, slots = spec
+        return cls(shape, slots, name)
+
+    def close(self):
+        self.frames = None  # The block can't be closed while a numpy view still points into it
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+def capture_frames(source, spec, free_slots, filled, stride, analysers, stop_event):
+    # Decodes into free slots and hands over (slot, index, span), span counting the frames grabbed after it
+    ring = SharedFrameRing.attach(spec)
+    cap = open_capture(source)
+    index = 0
+    try:
+        while not stop_event.is_set():
+            try:
+                slot = free_slots.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            target = ring.frames[slot]
+            ret, frame = cap.read(target)
+            if not ret:
+                break
+            if frame.ctypes.data != target.ctypes.data:
+                # The decoder ignored the slot because the frame size changed; the one copy on this path
+                target[:] = frame if frame.shape == ring.shape else cv2.resize(frame, (ring.shape[1], ring.shape[0]))
+            filled.put((slot, index, 1 + skip_frames(cap, stride - 1)))
+            index += 1
+    finally:
+        for _ in range(analysers):
+            filled.put(None)
+        cap.release()
+        ring.close()
+
+def analyze_slots(spec, free_slots, filled, results, num_key_notes, grid):
+    # Same analysis as read_color_batches and drive_synth, reading the slot in place
+    ring = SharedFrameRing.attach(spec)
+    try:
+        while True:
+            item = filled.get()
+            if item is None:
+                break
+            slot, index, span = item
+            frame = resize_frame(ring.frames[slot])
+            free_slots.put(slot)  # Everything after the resize works on the small copy
+            if grid:
+                analysis = analyze_tiles(frame, grid, num_key_notes)
+            else:
+                analysis = colors_to_chord_indices(np.array([cv2.mean(frame)[:3]]), num_key_notes)
+                analysis['frames'] = span
+            results.put((index, span, analysis))
+    finally:
+        results.put(None)
+        ring.close()
+
+class SharedFrameAnalyzer:
+    # One capture process and `processes` analysis processes around a SharedFrameRing. Iterating
+    # yields (span, analysis) in frame order; only slot numbers and the small results are pickled
+    def __init__(self, source, num_key_notes, stride=1, grid=None, processes=ANALYSIS_PROCESSES, slots=FRAME_SLOTS):
+        cap = open_capture(source)
+        ret, frame = cap.read()  # The slots need the frame size before the capture process starts
+        cap.release()
+        if not ret:
+            raise IOError(f"Cannot open video source: {source}")
+        self.ring = SharedFrameRing(frame.shape, max(slots, processes + 2))
+        context = multiprocessing.get_context()
+        self.free_slots = context.Queue()
+        for slot in range(self.ring.slots):
+            self.free_slots.put(slot)
+        self.filled = context.Queue()
+        self.results = context.Queue()
+        self.stop_event = context.Event()
+        self.capture = context.Process(target=capture_frames, daemon=True,
+                                       args=(source, self.ring.spec(), self.free_slots, self.filled, stride, processes, self.stop_event))
+        self.analysers = [context.Process(target=analyze_slots, daemon=True,
+                                          args=(self.ring.spec(), self.free_slots, self.filled, self.results, num_key_notes, grid))
+                          for _ in range(processes)]
+        for process in [self.capture] + self.analysers:
+            process.start()
+
+    def __iter__(self):
+        # Analysers finish out of order; hold results until the next index arrives
+        pending = {}
+        next_index = 0
+        finished = 0
+        while finished < len(self.analysers):
+            try:
+                item = self.results.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in self.analysers):
+                    raise RuntimeError("Analysis processes exited without finishing")
+                continue
+            if item is None:
+                finished += 1
+                continue
+            index, span, analysis = item
+            pending[index] = (span, analysis)
+            while next_index in pending:
+                yield pending.pop(next_index)
+                next_index += 1
+
+    def close(self):
+        self.stop_event.set()
+        for process in [self.capture] + self.analysers:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        self.ring.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,340 @@
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .music import NOTES, CHORD_TYPES
+
+CHUNK_SIZE = 1024
+SAMPLE_RATE = 44100
+RAMP_TIME = 0.05  # Seconds to glide between chords
+CHORD_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Band-limited wavetables, one table per octave band so the harmonics never pass Nyquist
+WAVETABLE_SIZE = 4096
+WAVETABLE_BASE_FREQ = 20.0
+WAVETABLE_LEVELS = 11
+WAVEFORMS = ['sine', 'square', 'sawtooth']
+
+def build_wavetable(waveform, max_harmonic, size=WAVETABLE_SIZE):
+    k = np.arange(1, max(1, min(max_harmonic, size // 2 - 1)) + 1)
+    if waveform == 'square':
+        amplitudes = np.where(k % 2 == 1, 4 / (np.pi * k), 0.0)
+    elif waveform == 'sawtooth':
+        amplitudes = 2 / (np.pi * k) * np.where(k % 2 == 1, 1.0, -1.0)
+    else:
+        amplitudes = (k == 1).astype(float)
+    spectrum = np.zeros(size // 2 + 1, dtype=complex)
+    spectrum[k] = -1j * amplitudes * size / 2
+    table = np.fft.irfft(spectrum, size)
+    return np.append(table, table[0])  # Guard point so interpolation never wraps
+
+def build_wavetables():
+    tables = {}
+    for waveform in WAVEFORMS:
+        levels = []
+        for level in range(WAVETABLE_LEVELS):
+            top_freq = WAVETABLE_BASE_FREQ * 2 ** level
+            levels.append(build_wavetable(waveform, int(SAMPLE_RATE / 2 / top_freq)))
+        tables[waveform] = levels
+    return tables
+
+WAVETABLES = build_wavetables()
+
+def get_wavetable(frequency, waveform='sine'):
+    levels = WAVETABLES.get(waveform, WAVETABLES['sine'])
+    level = 0
+    if frequency > WAVETABLE_BASE_FREQ:
+        level = min(WAVETABLE_LEVELS - 1, math.ceil(math.log2(frequency / WAVETABLE_BASE_FREQ)))
+    return levels[level]
+
+# Per-thread scratch buffers so repeated calls don't allocate
+_scratch = threading.local()
+
+def get_scratch(num_samples):
+    if getattr(_scratch, 'size', 0) < num_samples:
+        _scratch.size = num_samples
+        _scratch.ramp = np.arange(num_samples, dtype=np.float64)
+        _scratch.position = np.empty(num_samples)
+        _scratch.index = np.empty(num_samples, dtype=np.intp)
+        _scratch.upper = np.empty(num_samples)
+        _scratch.note = np.empty(num_samples)
+    return _scratch
+
+def oscillate(table, phase, increment, out):
+    # Phase accumulator lookup with linear interpolation; phase is in table samples
+    n = len(out)
+    scratch = get_scratch(n)
+    position, index, upper = scratch.position[:n], scratch.index[:n], scratch.upper[:n]
+    np.multiply(scratch.ramp[:n], increment, out=position)
+    position += phase
+    np.mod(position, WAVETABLE_SIZE, out=position)
+    np.copyto(index, position, casting='unsafe')
+    np.take(table, index, out=out)
+    index += 1
+    np.take(table, index, out=upper)
+    position -= index
+    position += 1  # Fractional part
+    upper -= out
+    upper *= position
+    out += upper
+    return (phase + n * increment) % WAVETABLE_SIZE
+
+def generate_note(frequency, duration, waveform='sine', out=None):
+    if out is None:
+        out = np.empty(int(SAMPLE_RATE * duration))
+    oscillate(get_wavetable(frequency, waveform), 0.0, frequency * WAVETABLE_SIZE / SAMPLE_RATE, out)
+    return out
+
+def generate_chord(base_freq, chord_type, duration, waveform='sine', out=None):
+    num_samples = int(SAMPLE_RATE * duration)
+    if out is None:
+        out = np.empty(num_samples)
+    out[:] = 0
+    note = get_scratch(num_samples).note[:num_samples]
+    for interval in CHORD_TYPES[chord_type]:
+        freq = base_freq * (2 ** (interval / 12))
+        out += generate_note(freq, duration, waveform, out=note)
+    out /= 3  # Normalize amplitude
+    return out
+
+MAX_CHORD_NOTES = max(len(intervals) for intervals in CHORD_TYPES.values())
+
+class SynthVoice:
+    # Keeps oscillator phase between blocks so consecutive chords join without clicks
+    channels = 1
+
+    def __init__(self, block_size=CHUNK_SIZE, ramp_time=RAMP_TIME):
+        self.block_size = block_size
+        self.ramp_step = min(1.0, block_size / (SAMPLE_RATE * ramp_time))
+        self.target = None
+        self.waveform = None
+        self.phases = np.zeros(MAX_CHORD_NOTES)
+        self.freqs = np.zeros(MAX_CHORD_NOTES)
+        self.gains = np.zeros(MAX_CHORD_NOTES)
+        self.ramp = np.arange(block_size, dtype=np.float64)
+        self.fade = np.empty(block_size)
+        self.note = np.empty(block_size)
+        self.previous = np.empty(block_size)
+
+    def set_chord(self, base_freq, chord_type, waveform='sine', velocity=1.0):
+        # Single assignment so the audio thread always sees a consistent chord
+        self.target = (base_freq, chord_type, waveform, velocity)
+
+    def release(self):
+        # Fades the current chord out; the next set_chord starts a new note
+        target = self.target
+        if target is not None:
+            self.target = target[:3] + (0.0,)
+
+    def render(self, out):
+        n = len(out)
+        if n > self.block_size:
+            raise ValueError(f"Block of {n} samples is larger than voice block size {self.block_size}")
+        out[:] = 0
+        target = self.target
+        if target is None:
+            return out
+
+        base_freq, chord_type, waveform, velocity = target
+        if velocity == 0 and not self.gains.any():
+            return out  # Released and fully faded: nothing to oscillate
+        intervals = CHORD_TYPES[chord_type]
+        previous_waveform = self.waveform or waveform
+        self.waveform = waveform
+        fade, note, previous = self.fade[:n], self.note[:n], self.previous[:n]
+        np.multiply(self.ramp[:n], 1 / n, out=fade)
+
+        for slot in range(MAX_CHORD_NOTES):
+            if slot < len(intervals):
+                target_freq = base_freq * (2 ** (intervals[slot] / 12))
+                target_gain = velocity
+            else:
+                target_freq = self.freqs[slot]
+                target_gain = 0.0
+
+            start_gain = self.gains[slot]
+            end_gain = min(start_gain + self.ramp_step, target_gain) if target_gain > start_gain else max(start_gain - self.ramp_step, target_gain)
+            self.gains[slot] = end_gain
+            if start_gain == 0 and end_gain == 0:
+                continue
+
+            # New notes start on pitch, sounding ones glide towards it
+            if start_gain == 0:
+                self.freqs[slot] = target_freq
+            else:
+                self.freqs[slot] += (target_freq - self.freqs[slot]) * self.ramp_step
+            freq = self.freqs[slot]
+            increment = freq * WAVETABLE_SIZE / SAMPLE_RATE
+            phase = self.phases[slot]
+
+            self.phases[slot] = oscillate(get_wavetable(freq, waveform), phase, increment, note)
+            if previous_waveform != waveform:
+                oscillate(get_wavetable(freq, previous_waveform), phase, increment, previous)
+                note -= previous
+                note *= fade
+                note += previous
+
+            # Linear gain ramp across the block
+            if start_gain != end_gain:
+                previous[:] = fade
+                previous *= end_gain - start_gain
+                previous += start_gain
+                note *= previous
+            elif end_gain != 1.0:
+                note *= end_gain
+            out += note
+
+        out /= 3  # Normalize amplitude like generate_chord
+        return out
+
+class ChordCache:
+    # LRU cache of rendered chords; entries are shared between callers, so they are handed out read-only.
+    # render(base_freq, chord_type, duration, waveform) lets a script cache its own synthesis
+    def __init__(self, max_bytes=CHORD_CACHE_MAX_BYTES, render=generate_chord):
+        self.max_bytes = max_bytes
+        self.render = render
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, base_note, chord_type, waveform, duration, key, scale):
+        cache_key = (base_note, chord_type, waveform, duration, key, scale)
+        with self.lock:
+            chord = self.entries.get(cache_key)
+            if chord is not None:
+                self.entries.move_to_end(cache_key)
+                self.hits += 1
+                return chord
+            self.misses += 1
+
+        chord = self.render(NOTES[base_note], chord_type, duration, waveform)
+        chord.flags.writeable = False
+        with self.lock:
+            if cache_key not in self.entries:
+                self.entries[cache_key] = chord
+                self.size += chord.nbytes
+                while self.size > self.max_bytes and self.entries:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.size -= evicted.nbytes
+        return chord
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+# Oscillator-bank versions of the chord and wavetable data, indexed by chord/waveform number
+CHORD_RATIOS = np.array([[2 ** (interval / 12) for interval in intervals] + [1.0] * (MAX_CHORD_NOTES - len(intervals))
+                         for intervals in CHORD_TYPES.values()])
+CHORD_MASK = np.array([[1.0] * len(intervals) + [0.0] * (MAX_CHORD_NOTES - len(intervals))
+                       for intervals in CHORD_TYPES.values()])
+WAVETABLE_BANK = np.stack([table for waveform in WAVEFORMS for table in WAVETABLES[waveform]])
+
+def wavetable_rows(freqs, waveform_indices):
+    # Vectorised get_wavetable: row of WAVETABLE_BANK for each frequency/waveform pair
+    levels = np.ceil(np.log2(np.maximum(freqs, WAVETABLE_BASE_FREQ) / WAVETABLE_BASE_FREQ))
+    return waveform_indices * WAVETABLE_LEVELS + np.clip(levels, 0, WAVETABLE_LEVELS - 1).astype(np.intp)
+
+class VoiceBank:
+    # Many SynthVoices rendered as one oscillator bank: every chord note of every voice is a row,
+    # so a block costs a fixed number of numpy calls however many voices there are.
+    # The mix is divided by the voice count like a chord by its note count: voices of the same
+    # colour share a frequency and start in phase, so they add up coherently
+    channels = 2
+
+    def __init__(self, num_voices, block_size=CHUNK_SIZE, ramp_time=RAMP_TIME):
+        num_oscillators = num_voices * MAX_CHORD_NOTES
+        self.num_voices = num_voices
+        self.block_size = block_size
+        self.ramp_step = min(1.0, block_size / (SAMPLE_RATE * ramp_time))
+        self.target = None
+        self.phases = np.zeros(num_oscillators)
+        self.freqs = np.zeros(num_oscillators)
+        self.rows = np.zeros(num_oscillators, dtype=np.intp)
+        self.gains = np.zeros(num_oscillators)
+        self.ramp = np.arange(block_size, dtype=np.float64)
+        self.fade = np.empty(block_size)
+        self.fraction = np.empty((num_oscillators, block_size))
+        self.index = np.empty((num_oscillators, block_size), dtype=np.intp)
+        self.flat_index = np.empty((num_oscillators, block_size), dtype=np.intp)
+        self.samples = np.empty((num_oscillators, block_size))
+        self.upper = np.empty((num_oscillators, block_size))
+        self.table = WAVETABLE_BANK.ravel()
+
+    def set_voices(self, base_freqs, chord_indices, waveform_indices, gains, pans):
+        # One entry per voice; gains are velocities from 0 to 1, pans run from -1 (left) to 1 (right) with constant power
+        freqs = (base_freqs[:, None] * CHORD_RATIOS[chord_indices]).ravel()
+        levels = (gains[:, None] * CHORD_MASK[chord_indices]).ravel()
+        angles = np.repeat((np.asarray(pans) + 1) * np.pi / 4, MAX_CHORD_NOTES)
+        waveforms = np.repeat(waveform_indices, MAX_CHORD_NOTES)
+        scale = 1 / (3 * self.num_voices)
+        self.target = (freqs, waveforms, levels, np.cos(angles) * scale, np.sin(angles) * scale)
+
+    def lookup(self, rows, index, fraction, out, flat_index, upper):
+        np.add(index, (rows * WAVETABLE_BANK.shape[1])[:, None], out=flat_index)
+        np.take(self.table, flat_index, out=out)
+        flat_index += 1
+        np.take(self.table, flat_index, out=upper)
+        upper -= out
+        upper *= fraction
+        out += upper
+        return out
+
+    def render(self, out):
+        # out is an (n, 2) stereo block
+        n = len(out)
+        if n > self.block_size:
+            raise ValueError(f"Block of {n} samples is larger than voice block size {self.block_size}")
+        out[:] = 0
+        target = self.target
+        if target is None:
+            return out
+
+        target_freqs, waveforms, target_gains, left, right = target
+        if not (target_gains.any() or self.gains.any()):
+            return out  # Every voice released and faded out, as in a still scene in event mode
+        fade = self.fade[:n]
+        np.multiply(self.ramp[:n], 1 / n, out=fade)
+
+        # New notes start on pitch, sounding ones glide towards it
+        sounding = self.gains != 0
+        self.freqs = np.where(sounding, self.freqs + (target_freqs - self.freqs) * self.ramp_step, target_freqs)
+        rows = wavetable_rows(self.freqs, waveforms)
+
+        increments = self.freqs * (WAVETABLE_SIZE / SAMPLE_RATE)
+        fraction, index = self.fraction[:, :n], self.index[:, :n]
+        np.multiply(self.ramp[:n], increments[:, None], out=fraction)
+        fraction += self.phases[:, None]
+        np.mod(fraction, WAVETABLE_SIZE, out=fraction)
+        np.copyto(index, fraction, casting='unsafe')
+        fraction -= index
+        self.phases = (self.phases + n * increments) % WAVETABLE_SIZE
+
+        samples = self.lookup(rows, index, fraction, self.samples[:, :n], self.flat_index[:, :n], self.upper[:, :n])
+
+        # Crossfade notes whose waveform or band-limited table changed
+        changed = np.flatnonzero(sounding & (rows != self.rows))
+        if len(changed):
+            previous = self.lookup(self.rows[changed], index[changed], fraction[changed],
+                                   np.empty((len(changed), n)), np.empty((len(changed), n), dtype=np.intp), np.empty((len(changed), n)))
+            samples[changed] = previous + (samples[changed] - previous) * fade
+        self.rows = rows
+
+        # Gains move by at most ramp_step per block like SynthVoice's, so releases reach exactly zero.
+        # They ramp linearly across the block, so each channel is start @ samples + fade * (step @ samples)
+        end_gains = self.gains + np.clip(target_gains - self.gains, -self.ramp_step, self.ramp_step)
+        steps = end_gains - self.gains
+        mix = np.stack([self.gains * left, steps * left, self.gains * right, steps * right]) @ samples
+        np.multiply(mix[1], fade, out=out[:, 0])
+        out[:, 0] += mix[0]
+        np.multiply(mix[3], fade, out=out[:, 1])
+        out[:, 1] += mix[2]
+        self.gains = end_gains
+        return out
+
+def make_synth(grid=None):
+    return VoiceBank(grid[0] * grid[1]) if grid else SynthVoice()